@@ -18,6 +18,7 @@ from models.ensemble import Ensemble
 from models.gig import Gig
 from models.jam_post import JamPost
 from decorators import admin_required
+from services import membership
 from sqlalchemy import func
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
@@ -160,10 +161,7 @@ def get_user_detail(admin_user, user_id):
         return jsonify({'error': 'User not found'}), 404
     
     # Count user's ensembles
-    ensemble_count = Ensemble.query.filter(
-        (Ensemble.leader_id == user_id) | 
-        (Ensemble.members.any(id=user_id))
-    ).count()
+    ensemble_count = len(membership.ensemble_ids_for(user_id))
     
     # Count jam posts if musician
     jam_post_count = JamPost.query.filter_by(author_id=user_id).count() if user.role == 'musician' else 0
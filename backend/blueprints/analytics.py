@@ -13,6 +13,7 @@ from models.venue import Venue
 from models.ensemble import Ensemble
 from models.gig import Gig, GigApplication
 from decorators import login_required
+from services import membership
 from sqlalchemy import func
 from datetime import datetime, timedelta
 
@@ -46,12 +47,7 @@ def get_musician_analytics(current_user):
     is_pro = current_user.is_pro
     
     # Get all ensembles this musician is part of
-    musician_ensembles = Ensemble.query.filter(
-        (Ensemble.leader_id == current_user.id) | 
-        (Ensemble.members.any(id=current_user.id))
-    ).all()
-    
-    ensemble_ids = [e.id for e in musician_ensembles]
+    ensemble_ids = membership.ensemble_ids_for(current_user.id)
     
     # Total gigs played (accepted applications)
     total_gigs = GigApplication.query.filter(
@@ -62,9 +58,7 @@ def get_musician_analytics(current_user):
     # Completed gigs (with confirmation)
     completed_gigs = GigApplication.query.filter(
         GigApplication.ensemble_id.in_(ensemble_ids),
-        GigApplication.confirmed_at.isnot(None),
-        GigApplication.gig_happened_venue == True,
-        GigApplication.gig_happened_ensemble == True
+        GigApplication.is_verified == True
     ).count() if ensemble_ids else 0
     
     # Total applications submitted
@@ -99,9 +93,9 @@ def get_musician_analytics(current_user):
     
     # Genre breakdown (from gig titles/descriptions - simplified)
     genre_data = {}
-    for ensemble in musician_ensembles:
+    for ensemble_id in ensemble_ids:
         applications = GigApplication.query.filter_by(
-            ensemble_id=ensemble.id,
+            ensemble_id=ensemble_id,
             status='accepted'
         ).all()
         
@@ -121,6 +115,7 @@ def get_musician_analytics(current_user):
     
     # Collaborators (other musicians in ensembles)
     collaborators = set()
+    musician_ensembles = Ensemble.query.filter(Ensemble.id.in_(ensemble_ids)).all() if ensemble_ids else []
     for ensemble in musician_ensembles:
         for member in ensemble.members:
             if member.id != current_user.id:
@@ -201,9 +196,7 @@ def get_venue_analytics(current_user):
     # Verified gigs (both parties confirmed)
     verified_gigs = GigApplication.query.join(Gig).filter(
         Gig.venue_id == venue.id,
-        GigApplication.confirmed_at.isnot(None),
-        GigApplication.gig_happened_venue == True,
-        GigApplication.gig_happened_ensemble == True
+        GigApplication.is_verified == True
     ).count()
     
     # Completion rate
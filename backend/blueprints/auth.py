@@ -6,6 +6,8 @@ Handles Google OAuth and Email login (mock for MVP)
 from flask import Blueprint, request, jsonify
 from database import db
 from models.user import User
+from services import feed_ranking
+from blueprints.jam_board import invalidate_feed_cache
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -107,7 +109,15 @@ def signup():
         user.vibe_tags = data.get('vibe_tags')  # Comma-separated string
     
     db.session.add(user)
+    
+    # Seed the new musician's "For You" jam feed from existing posts
+    if role == 'musician':
+        db.session.flush()
+        feed_ranking.rescore_user(user)
+    
     db.session.commit()
+    if role == 'musician':
+        invalidate_feed_cache()
     
     return jsonify({
         'message': 'Signup successful',
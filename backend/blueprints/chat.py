@@ -3,11 +3,16 @@ Chat Blueprint
 Minimal 1-to-1 text messaging
 """
 
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from database import db
-from models.message import Message
+from models.message import Message, message_unread_counts, unread_total, mark_read_up_to
 from models.user import User
-from sqlalchemy import or_, and_
+from models.venue import Venue
+from pagination import encode_cursor, decode_cursor, page_size, InvalidCursor
+from services import chat_events, chat_writer
+from services.chat_archive import archived_messages
+from sqlalchemy import or_, and_, case, func, union_all
 
 chat_bp = Blueprint('chat', __name__)
 
@@ -37,20 +42,168 @@ def get_conversations(user_id):
     }), 200
 
 
+@chat_bp.route('/inbox/<int:user_id>', methods=['GET'])
+def get_inbox(user_id):
+    """
+    Inbox: one entry per conversation partner with the last message,
+    its timestamp and the unread count, most recent conversation first
+    
+    Built from a single query (peer + venue profile joined in),
+    keyset-paginated with `limit` / `cursor` -> `next_cursor`
+    """
+    # Message ids are assigned in send order, so max(id) is the latest message.
+    # Each side is read from its own (user, conversation_key, id) index
+    # instead of scanning messages for "sender OR receiver"
+    def latest_per_conversation(side):
+        return db.select(
+            Message.conversation_key.label('conversation_key'),
+            func.max(Message.id).label('last_message_id')
+        ).where(side == user_id).group_by(Message.conversation_key)
+    
+    sides = union_all(
+        latest_per_conversation(Message.sender_id),
+        latest_per_conversation(Message.receiver_id)
+    ).subquery()
+    threads = db.select(
+        sides.c.conversation_key,
+        func.max(sides.c.last_message_id).label('last_message_id')
+    ).group_by(sides.c.conversation_key).subquery()
+    
+    # The other side of the last message, from this user's point of view
+    peer_id = case(
+        (Message.sender_id == user_id, Message.receiver_id),
+        else_=Message.sender_id
+    )
+    
+    query = db.session.query(
+        func.coalesce(message_unread_counts.c.unread_count, 0),
+        Message, User, Venue.name.label('venue_name')
+    ).select_from(threads).join(
+        Message, Message.id == threads.c.last_message_id
+    ).join(
+        User, User.id == peer_id
+    ).outerjoin(
+        Venue, Venue.user_id == User.id
+    ).outerjoin(
+        message_unread_counts, and_(
+            message_unread_counts.c.user_id == user_id,
+            message_unread_counts.c.conversation_key == threads.c.conversation_key
+        )
+    )
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            (cursor_message_id,) = decode_cursor(cursor, 1)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(threads.c.last_message_id < cursor_message_id)
+    
+    limit = page_size(request.args.get('limit', type=int))
+    rows = query.order_by(threads.c.last_message_id.desc()).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].Message.id)
+    
+    last_messages = Message.to_dicts([row.Message for row in rows])
+    
+    return jsonify({
+        'conversations': [
+            {
+                'user': {
+                    'id': peer.id,
+                    'name': peer.name,
+                    'role': peer.role,
+                    'instrument': peer.instrument,
+                    'photo_url': peer.photo_url,
+                    'venue_name': venue_name
+                },
+                'last_message': last_message,
+                'last_message_at': message.created_at.isoformat(),
+                'unread_count': unread_count
+            }
+            for (unread_count, message, peer, venue_name), last_message in zip(rows, last_messages)
+        ],
+        'next_cursor': next_cursor
+    }), 200
+
+
 @chat_bp.route('/messages/<int:user_id>/<int:other_user_id>', methods=['GET'])
 def get_messages(user_id, other_user_id):
     """
-    Get all messages between two users
+    Get messages between two users, one page at a time (oldest first)
+    
+    - No cursor: the latest `limit` messages (default CHAT_PAGE_SIZE)
+    - ?before=<before_cursor>: the page of older messages (scrolling up)
+    - ?after=<after_cursor>: messages newer than the page (polling)
+    
+    `before_cursor` is null once the start of the history is reached.
+    Pages reach into archived (cold) history transparently.
     """
-    messages = Message.query.filter(
-        or_(
-            and_(Message.sender_id == user_id, Message.receiver_id == other_user_id),
-            and_(Message.sender_id == other_user_id, Message.receiver_id == user_id)
+    # Both directions share one conversation key -> a single index range scan
+    conversation_key = Message.conversation_key_for(user_id, other_user_id)
+    query = Message.query.filter_by(conversation_key=conversation_key)
+    
+    before = request.args.get('before')
+    after = request.args.get('after')
+    limit = page_size(
+        request.args.get('limit', type=int),
+        default=current_app.config['CHAT_PAGE_SIZE']
+    )
+    
+    after_position = before_position = None
+    try:
+        if after:
+            after_created_at, after_id = after_position = decode_cursor(after, 2)
+            query = query.filter(or_(
+                Message.created_at > after_created_at,
+                and_(Message.created_at == after_created_at, Message.id > after_id)
+            ))
+        if before:
+            before_created_at, before_id = before_position = decode_cursor(before, 2)
+            query = query.filter(or_(
+                Message.created_at < before_created_at,
+                and_(Message.created_at == before_created_at, Message.id < before_id)
+            ))
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    def position(message):
+        return (message.created_at, message.id)
+    
+    if after and not before:
+        # Walk forward from the cursor
+        messages = query.order_by(Message.created_at.asc(), Message.id.asc()).limit(limit + 1).all()
+        # Archived rows only matter if they sort ahead of the hot page's last row
+        upper = position(messages[limit]) if len(messages) > limit else None
+        messages += archived_messages(conversation_key, lower=after_position, upper=upper, limit=limit)
+        messages = sorted(messages, key=position)[:limit]
+        has_more_before = True
+    else:
+        # Walk backward (latest first) then flip to chronological order
+        messages = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
+        # Scrolling past the hot range (or into a gap in it) reads the archive
+        lower = position(messages[limit]) if len(messages) > limit else after_position
+        messages += archived_messages(
+            conversation_key, lower=lower, upper=before_position, limit=limit + 1, newest_first=True
         )
-    ).order_by(Message.created_at.asc()).all()
+        messages = sorted(messages, key=position, reverse=True)[:limit + 1]
+        has_more_before = len(messages) > limit
+        messages = list(reversed(messages[:limit]))
+    
+    before_cursor = None
+    after_cursor = after
+    if messages:
+        if has_more_before:
+            before_cursor = encode_cursor(messages[0].created_at, messages[0].id)
+        after_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
     
     return jsonify({
-        'messages': [msg.to_dict() for msg in messages]
+        'messages': Message.to_dicts(messages),
+        'before_cursor': before_cursor,
+        'after_cursor': after_cursor
     }), 200
 
 
@@ -66,37 +219,35 @@ def send_message():
     if not all(field in data for field in required):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    # Verify users exist
-    sender = User.query.get(data['sender_id'])
-    receiver = User.query.get(data['receiver_id'])
+    content = data['content']
+    if not isinstance(content, str) or not content.strip():
+        return jsonify({'error': 'Message content required'}), 400
     
-    if not sender or not receiver:
+    # Verify users exist (cached ids, no per-send lookups under load)
+    if not chat_writer.users_exist(data['sender_id'], data['receiver_id']):
         return jsonify({'error': 'User not found'}), 404
     
-    # Create message
-    message = Message(
-        sender_id=data['sender_id'],
-        receiver_id=data['receiver_id'],
-        content=data['content']
-    )
-    
-    db.session.add(message)
-    db.session.commit()
+    # Create message (group-committed with concurrent sends when enabled)
+    try:
+        message = chat_writer.send_message(data['sender_id'], data['receiver_id'], content)
+    except chat_writer.ChatWriteError:
+        return jsonify({'error': 'Message could not be saved'}), 500
     
     return jsonify({
         'message': 'Message sent',
-        'data': message.to_dict()
+        'data': message
     }), 201
 
 
 @chat_bp.route('/mark-read/<int:message_id>', methods=['PUT'])
 def mark_read(message_id):
-    """Mark a message as read"""
+    """Mark a message (and everything before it in the conversation) as read"""
     message = Message.query.get(message_id)
     if not message:
         return jsonify({'error': 'Message not found'}), 404
     
-    message.is_read = True
+    if mark_read_up_to(message.receiver_id, message.sender_id, message.id):
+        chat_events.queue_unread_changed(db.session, message.receiver_id)
     db.session.commit()
     
     return jsonify({'message': 'Marked as read'}), 200
@@ -109,8 +260,14 @@ def mark_conversation_read(user_id, other_user_id):
     Mark ALL messages from 'other_user_id' to 'user_id' as read.
     This clears the notification when opening the chat.
     """
-    # Update all messages where receiver is ME (user_id) and sender is THEM (other_user_id)
-    Message.query.filter_by(sender_id=other_user_id, receiver_id=user_id, is_read=False).update({'is_read': True})
+    # Move MY (user_id) read marker for THEM (other_user_id) to their latest message
+    latest = Message.query.filter_by(
+        conversation_key=Message.conversation_key_for(user_id, other_user_id),
+        sender_id=other_user_id
+    ).order_by(Message.created_at.desc(), Message.id.desc()).first()
+    
+    if latest and mark_read_up_to(user_id, other_user_id, latest.id):
+        chat_events.queue_unread_changed(db.session, user_id)
     
     db.session.commit()
     return jsonify({'message': 'Conversation marked as read'}), 200
@@ -122,10 +279,103 @@ def get_unread_count(user_id):
     Get the total number of unread messages for a user
     Used for the red notification badge
     """
-    # Count messages where user is the receiver AND is_read is False
-    count = Message.query.filter_by(receiver_id=user_id, is_read=False).count()
-    
     return jsonify({
         'user_id': user_id,
-        'unread_count': count
-    }), 200
\ No newline at end of file
+        'unread_count': _unread_count(user_id)
+    }), 200
+
+
+@chat_bp.route('/stream/<int:user_id>', methods=['GET'])
+def stream_events(user_id):
+    """
+    Server-Sent Events feed for one user (use with EventSource)
+    
+    Pushes `message` (new message to or from the user), `message_updated`
+    (invite accepted/declined) and `unread` ({"unread_count": n}) events as
+    they are committed. An idle connection only receives a keep-alive
+    comment every CHAT_STREAM_HEARTBEAT seconds and holds no DB connection.
+    """
+    heartbeat = current_app.config['CHAT_STREAM_HEARTBEAT']
+    
+    def generate():
+        with chat_events.get_broker().subscribe(user_id) as subscription:
+            yield 'retry: 3000\n\n'
+            yield _sse('unread', {'unread_count': _unread_count(user_id, release=True)})
+            while True:
+                events = subscription.wait(heartbeat)
+                if not events:
+                    yield ': keep-alive\n\n'
+                    continue
+                for item in events:
+                    if item['event'] != 'unread':
+                        yield _sse(item['event'], item['data'])
+                if _affects_unread(events, user_id):
+                    yield _sse('unread', {'unread_count': _unread_count(user_id, release=True)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@chat_bp.route('/poll/<int:user_id>', methods=['GET'])
+def poll_events(user_id):
+    """
+    Long-poll fallback for clients that can't use the SSE stream
+    
+    - ?since=<message id>: messages newer than this are returned at once
+    - otherwise waits up to `timeout` seconds (max CHAT_POLL_TIMEOUT) for
+      the next events
+    
+    Returns the same events as the stream plus `unread_count`; pass the
+    returned `since` on the next call so nothing is missed in between.
+    """
+    max_timeout = current_app.config['CHAT_POLL_TIMEOUT']
+    timeout = max(0, min(request.args.get('timeout', max_timeout, type=int), max_timeout))
+    since = request.args.get('since', type=int)
+    
+    # Subscribe before the catch-up read so nothing slips between the two
+    with chat_events.get_broker().subscribe(user_id) as subscription:
+        events = []
+        if since is not None:
+            # Served as a multi-index OR over the per-side (user, conversation) indexes
+            missed = Message.query.filter(
+                or_(Message.sender_id == user_id, Message.receiver_id == user_id),
+                Message.id > since
+            ).order_by(Message.id).limit(current_app.config['CHAT_PAGE_SIZE']).all()
+            events = [{'event': 'message', 'data': data} for data in Message.to_dicts(missed)]
+        if not events:
+            # Don't hold a pooled connection while waiting
+            db.session.close()
+            events = subscription.wait(timeout)
+    
+    latest = since
+    for item in events:
+        if item['event'] == 'message':
+            latest = max(latest or 0, item['data']['id'])
+    
+    return jsonify({
+        'events': [item for item in events if item['event'] != 'unread'],
+        'unread_count': _unread_count(user_id),
+        'since': latest
+    }), 200
+
+
+def _unread_count(user_id, release=False):
+    """Unread messages addressed to user_id; release=True frees the DB connection afterwards"""
+    count = unread_total(user_id)
+    if release:
+        db.session.close()
+    return count
+
+
+def _affects_unread(events, user_id):
+    return any(
+        item['event'] == 'unread' or item['data'].get('receiver_id') == user_id
+        for item in events
+    )
+
+
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
\ No newline at end of file
@@ -8,6 +8,7 @@ from database import db
 from models.ensemble import Ensemble
 from models.user import User
 from models.message import Message 
+from services import membership
 
 ensembles_bp = Blueprint('ensembles', __name__)
 
@@ -32,6 +33,7 @@ def create_ensemble():
     ensemble.members.append(leader)
     db.session.add(ensemble)
     db.session.commit()
+    membership.invalidate(leader.id)
     return jsonify({'message': 'Ensemble created', 'ensemble': ensemble.to_dict()}), 201
 
 @ensembles_bp.route('/<int:ensemble_id>', methods=['GET'])
@@ -94,6 +96,7 @@ def accept_invite(ensemble_id):
         )
         db.session.add(confirm_msg)
         db.session.commit()
+        membership.invalidate(user.id)
         return jsonify({'message': 'Invite accepted', 'ensemble': ensemble.to_dict()}), 200
     
     elif user in ensemble.members:
@@ -175,6 +178,7 @@ def remove_member(ensemble_id, user_id):
     db.session.add(notification_msg)
     ensemble.members.remove(user)
     db.session.commit()
+    membership.invalidate(user.id)
     return jsonify({'message': 'Member removed and notified'}), 200
 
 @ensembles_bp.route('/user/<int:user_id>', methods=['GET'])
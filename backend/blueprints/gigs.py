@@ -5,19 +5,31 @@ Gig postings, applications, and the Gig Handshake flow
 
 from flask import Blueprint, request, jsonify
 from database import db
-from models.gig import Gig, GigApplication
+from models.gig import Gig, GigApplication, GigEvent
 from models.venue import Venue
-from models.ensemble import Ensemble
+from models.ensemble import Ensemble, ensemble_members
 from models.user import User
 from models.message import Message
-from datetime import datetime
-from sqlalchemy import or_, and_
+from datetime import date, datetime, timedelta
+from sqlalchemy import or_, and_, case
+from sqlalchemy.orm import contains_eager
+from streaming import wants_stream, stream_json_list
+from pagination import encode_cursor, decode_cursor, page_size, InvalidCursor
+from services import membership
 
 gigs_bp = Blueprint('gigs', __name__)
 
 
 # ===== GIG POSTINGS =====
 
+def _window_end(value):
+    """Exclusive upper bound for ?to=: the next day for a plain date, else just past the instant"""
+    try:
+        return datetime.combine(date.fromisoformat(value), datetime.min.time()) + timedelta(days=1)
+    except ValueError:
+        return datetime.fromisoformat(value) + timedelta(microseconds=1)
+
+
 @gigs_bp.route('/', methods=['GET'])
 def get_gigs():
     """
@@ -25,74 +37,122 @@ def get_gigs():
     - Public: Shows all open gigs.
     - Musician: Shows open gigs AND any closed gigs where they have an ACTIVE notification.
     - EXCLUDES: Open gigs where the musician was rejected and dismissed the alert.
+    - ?from= / ?to= (ISO dates) bound the gig date window; a plain date
+      for `to` includes that whole day
+    - Keyset pagination (enabled when `limit` or `cursor` is given):
+      at most `limit` gigs plus `next_cursor` (null on the last page)
+    - ?stream=true streams the list instead of building it in memory
     """
     location = request.args.get('location')
     filter_open = request.args.get('is_open', 'true').lower() == 'true'
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
     
-    user_id = request.headers.get('X-User-Id')
+    try:
+        date_from = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+        date_to = _window_end(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
     
-    # 1. Identify User and their Applications
-    my_app_status = {} # gig_id -> status
-    gigs_with_notifications = [] 
-    hidden_gig_ids = [] # IDs to explicitly hide (Rejected + Dismissed)
+    user_id = request.headers.get('X-User-Id')
     
+    # 1. Identify User and their ensembles
+    ensemble_ids = None
     if user_id:
         user = User.query.get(user_id)
         if user and user.role == 'musician':
             # Find ensembles where user is leader OR member
-            my_ensembles = Ensemble.query.filter(
-                (Ensemble.leader_id == user.id) | 
-                (Ensemble.members.any(id=user.id))
-            ).all()
-            
-            ensemble_ids = [e.id for e in my_ensembles]
-            
-            if ensemble_ids:
-                # Find all applications for these ensembles
-                my_apps = GigApplication.query.filter(
-                    GigApplication.ensemble_id.in_(ensemble_ids)
-                ).all()
-                
-                for app in my_apps:
-                    if not app.musician_acknowledged:
-                        # Active Notification: Show status and force gig to appear
-                        my_app_status[app.gig_id] = app.status
-                        if app.status in ['accepted', 'rejected']:
-                            gigs_with_notifications.append(app.gig_id)
-                    else:
-                        # Acknowledged (Dismissed)
-                        # If I was REJECTED and I dismissed it, I never want to see this open gig again.
-                        if app.status == 'rejected':
-                            hidden_gig_ids.append(app.gig_id)
-
-    # 2. Build Query
-    query = Gig.query
+            ensemble_ids = membership.ensemble_ids_for(user.id)
+    
+    # 2. Build Query: venue joined-loaded, viewer's applications LEFT JOINed
+    query = db.session.query(Gig).join(Gig.venue).options(contains_eager(Gig.venue))
+    
+    if ensemble_ids:
+        # One row per gig the viewer's ensembles applied to:
+        # - my_status: status of an application not yet dismissed (notification)
+        # - notify: an accepted/rejected result is waiting -> show even if closed
+        # - hidden: rejected and dismissed -> never show this gig again
+        acknowledged = db.func.coalesce(GigApplication.musician_acknowledged, False) == True
+        mine = db.session.query(
+            GigApplication.gig_id.label('gig_id'),
+            db.func.max(case((~acknowledged, GigApplication.status))).label('my_status'),
+            db.func.max(case(
+                (and_(~acknowledged, GigApplication.status.in_(['accepted', 'rejected'])), 1),
+                else_=0
+            )).label('notify'),
+            db.func.max(case(
+                (and_(acknowledged, GigApplication.status == 'rejected'), 1),
+                else_=0
+            )).label('hidden')
+        ).filter(
+            GigApplication.ensemble_id.in_(ensemble_ids)
+        ).group_by(GigApplication.gig_id).subquery()
+        
+        query = query.outerjoin(mine, mine.c.gig_id == Gig.id).add_columns(mine.c.my_status)
+    else:
+        mine = None
+        query = query.add_columns(db.null().label('my_status'))
     
     if filter_open:
-        # Show: (All Open Gigs) OR (Specific Closed Gigs with Notifications)
-        if gigs_with_notifications:
-            query = query.filter(or_(Gig.is_open == True, Gig.id.in_(gigs_with_notifications)))
+        if mine is not None:
+            # Show: (All Open Gigs) OR (Closed Gigs with Notifications),
+            # minus gigs where I was REJECTED and dismissed it
+            query = query.filter(
+                or_(Gig.is_open == True, mine.c.notify == 1),
+                or_(mine.c.hidden.is_(None), mine.c.hidden == 0)
+            )
         else:
-            query = query.filter_by(is_open=True)
-            
-        # FILTER OUT HIDDEN GIGS (Rejected + Dismissed)
-        if hidden_gig_ids:
-            query = query.filter(Gig.id.notin_(hidden_gig_ids))
-            
+            query = query.filter(Gig.is_open == True)
     else:
-        query = query.filter_by(is_open=False)
+        query = query.filter(Gig.is_open == False)
     
     if location:
-        query = query.join(Venue).filter(Venue.location.ilike(f'%{location}%'))
-    
-    gigs = query.order_by(Gig.date_time.asc()).all()
+        query = query.filter(Venue.location.ilike(f'%{location}%'))
+    
+    # Date window: with is_open this is a range scan on (is_open, date_time)
+    if date_from:
+        query = query.filter(Gig.date_time >= date_from)
+    if date_to:
+        query = query.filter(Gig.date_time < date_to)
+    
+    if cursor:
+        try:
+            cursor_date_time, cursor_id = decode_cursor(cursor, 2)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(or_(
+            Gig.date_time > cursor_date_time,
+            and_(Gig.date_time == cursor_date_time, Gig.id > cursor_id)
+        ))
+    
+    query = query.order_by(Gig.date_time.asc(), Gig.id.asc())
     
     # 3. Serialize
-    results = []
-    for gig in gigs:
-        gig_dict = gig.to_dict()
-        gig_dict['my_status'] = my_app_status.get(gig.id) 
-        results.append(gig_dict)
+    def serialize(rows):
+        results = []
+        for gig, my_status in rows:
+            gig_dict = gig.to_dict()
+            gig_dict['my_status'] = my_status
+            results.append(gig_dict)
+        return results
+    
+    if limit is not None or cursor:
+        limit = page_size(limit)
+        rows = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1][0]
+            next_cursor = encode_cursor(last.date_time, last.id)
+        return jsonify({
+            'gigs': serialize(rows),
+            'next_cursor': next_cursor
+        }), 200
+    
+    if wants_stream():
+        return stream_json_list('gigs', query, serialize)
+    
+    results = serialize(query.all())
     
     return jsonify({
         'gigs': results
@@ -162,6 +222,7 @@ def apply_to_gig(gig_id):
     
     application = GigApplication(gig_id=gig_id, ensemble_id=ensemble_id, status='pending')
     db.session.add(application)
+    GigEvent.record('applied', gig, application)
     db.session.commit()
     
     return jsonify({'message': 'Application submitted', 'application': application.to_dict()}), 201
@@ -169,11 +230,19 @@ def apply_to_gig(gig_id):
 
 @gigs_bp.route('/<int:gig_id>/applications', methods=['GET'])
 def get_gig_applications(gig_id):
-    """Get all applications for a gig"""
+    """
+    Get all applications for a gig
+    ?view=summary returns a compact ensemble (name + member/invite counts)
+    instead of the full member and invite lists (?view=full, default)
+    """
+    view = request.args.get('view', 'full')
+    if view not in ('full', 'summary'):
+        return jsonify({'error': 'Invalid view'}), 400
+    
     gig = Gig.query.get(gig_id)
     if not gig: return jsonify({'error': 'Gig not found'}), 404
-    applications = gig.applications.all()
-    return jsonify({'applications': [app.to_dict() for app in applications]}), 200
+    applications = GigApplication.listing_to_dicts(gig.applications.order_by(GigApplication.id), view)
+    return jsonify({'applications': applications}), 200
 
 
 @gigs_bp.route('/<int:gig_id>/dismiss', methods=['PUT'])
@@ -186,11 +255,7 @@ def dismiss_gig_notification(gig_id):
     if not user or user.role != 'musician':
         return jsonify({'error': 'Only musicians can dismiss notifications'}), 403
 
-    my_ensembles = Ensemble.query.filter(
-        (Ensemble.leader_id == user.id) | 
-        (Ensemble.members.any(id=user.id))
-    ).all()
-    ensemble_ids = [e.id for e in my_ensembles]
+    ensemble_ids = membership.ensemble_ids_for(user.id)
 
     application = GigApplication.query.filter(
         GigApplication.gig_id == gig_id,
@@ -228,6 +293,7 @@ def accept_application(application_id):
         msg_type='text'
     )
     db.session.add(start_msg)
+    GigEvent.record('accepted', gig, application)
     
     db.session.commit()
     return jsonify({
@@ -243,6 +309,7 @@ def reject_application(application_id):
     application = GigApplication.query.get(application_id)
     if not application: return jsonify({'error': 'Application not found'}), 404
     application.status = 'rejected'
+    GigEvent.record('rejected', application.gig, application)
     db.session.commit()
     return jsonify({'message': 'Application rejected'}), 200
 
@@ -259,13 +326,10 @@ def mark_gig_completed(gig_id):
     gig.completed_at = datetime.utcnow()
     
     accepted_app = GigApplication.query.filter_by(gig_id=gig_id, status='accepted').first()
+    GigEvent.record('venue_completed', gig, accepted_app)
     if accepted_app:
         accepted_app.gig_happened_venue = True
-        if accepted_app.gig_happened_ensemble is not None:
-            accepted_app.confirmed_at = datetime.utcnow()
-            if accepted_app.gig_happened_venue and accepted_app.gig_happened_ensemble:
-                gig.venue.verified_gig_count += 1
-                accepted_app.ensemble.verified_gig_count += 1
+        _settle_confirmation(accepted_app)
     
     db.session.commit()
     return jsonify({'message': 'Gig marked as completed', 'gig': gig.to_dict()}), 200
@@ -288,16 +352,56 @@ def confirm_gig_happened(application_id):
     else:
         return jsonify({'error': 'Invalid confirmer_role'}), 400
     
-    if application.gig_happened_venue is not None and application.gig_happened_ensemble is not None:
-        application.confirmed_at = datetime.utcnow()
-        if application.gig_happened_venue and application.gig_happened_ensemble:
-            application.gig.venue.verified_gig_count += 1
-            application.ensemble.verified_gig_count += 1
+    GigEvent.record('confirmed', application.gig, application,
+                    confirmer_role=confirmer_role, gig_happened=gig_happened)
+    _settle_confirmation(application)
     
     db.session.commit()
     return jsonify({'message': 'Confirmation recorded', 'application': application.to_dict()}), 200
 
 
+def _settle_confirmation(application):
+    """
+    Finalize the confirmation once both sides answered; keep the verified
+    counts in step with is_verified (both ways) and log the change
+    """
+    change = application.settle_confirmation()
+    if change:
+        application.gig.venue.verified_gig_count += change
+        application.ensemble.verified_gig_count += change
+        GigEvent.record('verified' if change > 0 else 'unverified', application.gig, application)
+
+
+# ===== GIG EVENTS =====
+
+@gigs_bp.route('/events', methods=['GET'])
+def get_gig_events():
+    """
+    Gig lifecycle events after a sequence number, oldest first
+    
+    - ?since=<seq> (default 0): only events with a higher sequence number
+    - ?gig_id= / ?venue_id= / ?ensemble_id=: narrow to one gig, venue or ensemble
+    - ?limit=: page size
+    
+    Returns `events` plus `next_since`, the sequence number to pass back
+    next time (unchanged when there is nothing new).
+    """
+    since = request.args.get('since', 0, type=int)
+    query = GigEvent.query.filter(GigEvent.id > since)
+    
+    for name in ('gig_id', 'venue_id', 'ensemble_id'):
+        value = request.args.get(name, type=int)
+        if value is not None:
+            query = query.filter(getattr(GigEvent, name) == value)
+    
+    events = query.order_by(GigEvent.id.asc()).limit(page_size(request.args.get('limit', type=int))).all()
+    
+    return jsonify({
+        'events': [event.to_dict() for event in events],
+        'next_since': events[-1].id if events else since
+    }), 200
+
+
 # ===== GIG HISTORY & MY GIGS =====
 
 @gigs_bp.route('/history/venue/<int:venue_id>', methods=['GET'])
@@ -305,24 +409,71 @@ def get_venue_gig_history(venue_id):
     """
     Get gig history for a venue
     STRICT FILTER: ONLY show gigs where status = 'completed'.
+    
+    One query: each gig with its accepted ensemble, leader name and member
+    count joined in. Keyset pagination (newest first) when `limit` or
+    `cursor` is given, with `next_cursor` null on the last page.
     """
     venue = Venue.query.get(venue_id)
     if not venue: return jsonify({'error': 'Venue not found'}), 404
     
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    
     # STRICT: DB Query filters for 'completed' only. No 'open' or 'accepted' gigs allowed.
-    gigs = Gig.query.filter_by(venue_id=venue_id, status='completed').order_by(Gig.date_time.desc()).all()
+    completed = Gig.query.filter_by(venue_id=venue_id, status='completed')
+    
+    accepted_application_id = db.select(db.func.min(GigApplication.id)).where(
+        GigApplication.gig_id == Gig.id,
+        GigApplication.status == 'accepted'
+    ).correlate(Gig).scalar_subquery()
+    members_count = db.select(db.func.count()).where(
+        ensemble_members.c.ensemble_id == Ensemble.id
+    ).correlate(Ensemble).scalar_subquery()
+    
+    query = completed.outerjoin(
+        GigApplication, GigApplication.id == accepted_application_id
+    ).outerjoin(
+        Ensemble, Ensemble.id == GigApplication.ensemble_id
+    ).outerjoin(
+        User, User.id == Ensemble.leader_id
+    ).add_columns(
+        Ensemble.id, Ensemble.name, User.name, members_count
+    )
+    
+    if cursor:
+        try:
+            cursor_date_time, cursor_id = decode_cursor(cursor, 2)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(or_(
+            Gig.date_time < cursor_date_time,
+            and_(Gig.date_time == cursor_date_time, Gig.id < cursor_id)
+        ))
+    
+    query = query.order_by(Gig.date_time.desc(), Gig.id.desc())
+    
+    next_cursor = None
+    if limit is not None or cursor:
+        limit = page_size(limit)
+        rows = query.limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0].date_time, rows[-1][0].id)
+        total = completed.count()
+    else:
+        rows = query.all()
+        total = len(rows)
     
     history = []
-    for gig in gigs:
-        accepted_app = GigApplication.query.filter_by(gig_id=gig.id, status='accepted').first()
-        
-        gig_data = gig.to_dict()
-        if accepted_app:
+    for gig, ensemble_id, ensemble_name, leader_name, ensemble_members_count in rows:
+        gig_data = gig.to_dict()  # gig.venue is the venue loaded above
+        if ensemble_id is not None:
             gig_data['accepted_ensemble'] = {
-                'id': accepted_app.ensemble.id,
-                'name': accepted_app.ensemble.name,
-                'leader_name': accepted_app.ensemble.leader.name,
-                'members_count': len(accepted_app.ensemble.members)
+                'id': ensemble_id,
+                'name': ensemble_name,
+                'leader_name': leader_name,
+                'members_count': ensemble_members_count
             }
         
         history.append(gig_data)
@@ -331,9 +482,10 @@ def get_venue_gig_history(venue_id):
         'venue': {'id': venue.id, 'name': venue.name, 'verified_gig_count': venue.verified_gig_count},
         'gigs': history,
         'stats': {
-            'total': len(history),
-            'verified_count': len(history)
-        }
+            'total': total,
+            'verified_count': total
+        },
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -351,10 +503,7 @@ def get_my_gigs():
     gigs_data = []
     
     if user.role == 'musician':
-        musician_ensembles = Ensemble.query.filter(
-            (Ensemble.leader_id == user.id) | (Ensemble.members.any(id=user.id))
-        ).all()
-        ensemble_ids = [e.id for e in musician_ensembles]
+        ensemble_ids = membership.ensemble_ids_for(user.id)
         
         if ensemble_ids:
             # Get accepted gigs
@@ -406,11 +555,8 @@ def mark_ensemble_completed(application_id):
     if application.gig.date_time > datetime.utcnow(): return jsonify({'error': 'Cannot mark as completed before gig date'}), 400
     
     application.gig_happened_ensemble = True
-    if application.gig_happened_venue is not None:
-        application.confirmed_at = datetime.utcnow()
-        if application.gig_happened_venue and application.gig_happened_ensemble:
-            application.gig.venue.verified_gig_count += 1
-            application.ensemble.verified_gig_count += 1
+    GigEvent.record('ensemble_completed', application.gig, application)
+    _settle_confirmation(application)
     
     db.session.commit()
     return jsonify({'message': 'Gig marked as completed', 'application': application.to_dict()}), 200
@@ -421,42 +567,84 @@ def get_ensemble_gig_history(ensemble_id):
     """
     Get gig history for an ensemble
     STRICT FILTER: Only show Fully Verified or Rejected applications
+    
+    The history predicate and stats run in SQL; gig and venue are joined
+    in. Keyset pagination (newest first) when `limit` or `cursor` is
+    given, with `next_cursor` null on the last page.
     """
     ensemble = Ensemble.query.get(ensemble_id)
     if not ensemble: return jsonify({'error': 'Ensemble not found'}), 404
     
-    applications = GigApplication.query.filter_by(ensemble_id=ensemble_id).join(Gig).order_by(Gig.date_time.desc()).all()
-    history = []
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    
+    # STRICT CHECK:
+    # 1. Rejected apps go to history
+    # 2. Accepted apps go to history ONLY if gig is 'completed' or confirmed_at is set
+    is_history = or_(
+        GigApplication.status == 'rejected',
+        and_(
+            GigApplication.status == 'accepted',
+            or_(Gig.status == 'completed', GigApplication.confirmed_at.isnot(None))
+        )
+    )
+    history_apps = GigApplication.query.join(GigApplication.gig).filter(
+        GigApplication.ensemble_id == ensemble_id, is_history
+    )
+    
+    total, verified, rejected = history_apps.with_entities(
+        db.func.count(GigApplication.id),
+        db.func.coalesce(db.func.sum(case((GigApplication.status == 'accepted', 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(case((GigApplication.status == 'rejected', 1), else_=0)), 0)
+    ).one()
+    
+    query = history_apps.join(Gig.venue).options(
+        contains_eager(GigApplication.gig).contains_eager(Gig.venue)
+    )
+    
+    if cursor:
+        try:
+            cursor_date_time, cursor_id = decode_cursor(cursor, 2)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(or_(
+            Gig.date_time < cursor_date_time,
+            and_(Gig.date_time == cursor_date_time, GigApplication.id < cursor_id)
+        ))
+    
+    query = query.order_by(Gig.date_time.desc(), GigApplication.id.desc())
+    
+    next_cursor = None
+    if limit is not None or cursor:
+        limit = page_size(limit)
+        applications = query.limit(limit + 1).all()
+        if len(applications) > limit:
+            applications = applications[:limit]
+            next_cursor = encode_cursor(applications[-1].gig.date_time, applications[-1].id)
+    else:
+        applications = query.all()
     
+    # Every row belongs to this ensemble: serialize it once
+    ensemble_data = ensemble.to_dict()
+    history = []
     for app in applications:
-        # STRICT CHECK:
-        # 1. Rejected apps go to history
-        # 2. Accepted apps go to history ONLY if gig is 'completed' or confirmed_at is set
-        is_history = False
-        
-        if app.status == 'rejected':
-            is_history = True
-        elif app.status == 'accepted':
-            if app.gig.status == 'completed' or app.confirmed_at:
-                is_history = True
-        
-        if is_history:
-            app_data = app.to_dict()
-            app_data['gig_details'] = {
-                'title': app.gig.title,
-                'date_time': app.gig.date_time.isoformat(),
-                'venue_name': app.gig.venue.name,
-                'venue_location': app.gig.venue.location,
-                'status': app.gig.status
-            }
-            history.append(app_data)
+        app_data = app.to_dict(ensemble=ensemble_data)
+        app_data['gig_details'] = {
+            'title': app.gig.title,
+            'date_time': app.gig.date_time.isoformat(),
+            'venue_name': app.gig.venue.name,
+            'venue_location': app.gig.venue.location,
+            'status': app.gig.status
+        }
+        history.append(app_data)
     
     return jsonify({
         'ensemble': {'id': ensemble.id, 'name': ensemble.name, 'verified_gig_count': ensemble.verified_gig_count},
         'applications': history,
         'stats': {
-            'total': len(history),
-            'verified': len([a for a in history if a['status'] == 'accepted']),
-            'rejected': len([a for a in history if a['status'] == 'rejected'])
-        }
+            'total': total,
+            'verified': verified,
+            'rejected': rejected
+        },
+        'next_cursor': next_cursor
     }), 200
\ No newline at end of file
@@ -8,13 +8,14 @@ Shows completed gigs with metadata for musicians and venues
 STRICT SCOPE: No payments, ratings, or notifications
 """
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from database import db
 from models.user import User
 from models.venue import Venue
 from models.ensemble import Ensemble
 from models.gig import Gig, GigApplication
 from decorators import login_required
+from services import membership
 from datetime import datetime
 
 history_bp = Blueprint('history', __name__, url_prefix='/api/history')
@@ -28,6 +29,10 @@ def get_musician_history(current_user):
     
     Role Check: Must be a musician
     Returns: List of completed gigs across all ensembles
+    ?verified=true lists only verified gigs
+    
+    The list is one joined query and verified_count a COUNT over the
+    is_verified index; neither walks applications in Python.
     
     Response Structure:
     {
@@ -56,12 +61,7 @@ def get_musician_history(current_user):
     
     try:
         # Get all ensembles this musician is part of
-        musician_ensembles = Ensemble.query.filter(
-            (Ensemble.leader_id == current_user.id) | 
-            (Ensemble.members.any(id=current_user.id))
-        ).all()
-        
-        ensemble_ids = [e.id for e in musician_ensembles]
+        ensemble_ids = membership.ensemble_ids_for(current_user.id)
         
         if not ensemble_ids:
             # No ensembles = no gig history
@@ -70,42 +70,38 @@ def get_musician_history(current_user):
                 'verified_count': 0
             }), 200
         
-        # Get all applications for these ensembles
-        applications = GigApplication.query.filter(
-            GigApplication.ensemble_id.in_(ensemble_ids)
-        ).join(Gig).order_by(Gig.date_time.desc()).all()
+        # Only accepted applications count as history
+        accepted = GigApplication.query.filter(
+            GigApplication.ensemble_id.in_(ensemble_ids),
+            GigApplication.status == 'accepted'
+        )
+        
+        # Verified = both parties confirmed (stored on the application)
+        verified = accepted.filter(GigApplication.is_verified == True)
+        verified_count = verified.count()
         
-        history = []
-        verified_count = 0
+        listed = verified if request.args.get('verified') == 'true' else accepted
+        rows = listed.join(GigApplication.gig).join(Gig.venue).join(GigApplication.ensemble).with_entities(
+            GigApplication.id, GigApplication.is_verified,
+            Gig.id, Gig.title, Gig.date_time, Gig.status,
+            Venue.name, Venue.location, Ensemble.name
+        ).order_by(Gig.date_time.desc())
         
-        for app in applications:
-            gig = app.gig
-            
-            # Only include accepted or completed gigs
-            if app.status != 'accepted':
-                continue
-            
-            # Check if verified (both parties confirmed)
-            is_verified = (
-                app.confirmed_at is not None and
-                app.gig_happened_venue == True and
-                app.gig_happened_ensemble == True
-            )
-            
-            if is_verified:
-                verified_count += 1
-            
-            history.append({
-                'id': app.id,
-                'gig_id': gig.id,
-                'gig_title': gig.title,
-                'venue_name': gig.venue.name,
-                'venue_location': gig.venue.location,
-                'date': gig.date_time.isoformat(),
-                'ensemble_name': app.ensemble.name,
-                'status': gig.status,  # open, accepted, completed
+        history = [
+            {
+                'id': app_id,
+                'gig_id': gig_id,
+                'gig_title': title,
+                'venue_name': venue_name,
+                'venue_location': venue_location,
+                'date': date_time.isoformat(),
+                'ensemble_name': ensemble_name,
+                'status': status,  # open, accepted, completed
                 'verified': is_verified
-            })
+            }
+            for (app_id, is_verified, gig_id, title, date_time, status,
+                 venue_name, venue_location, ensemble_name) in rows
+        ]
         
         return jsonify({
             'history': history,
@@ -130,6 +126,10 @@ def get_venue_history(current_user):
     
     Role Check: Must be a venue
     Returns: List of all gigs posted by this venue
+    ?verified=true lists only verified gigs
+    
+    Each gig is joined to its accepted application in one query and
+    verified_count is a COUNT over the is_verified index.
     
     Response Structure:
     {
@@ -165,44 +165,43 @@ def get_venue_history(current_user):
                 'verified_count': 0
             }), 200
         
-        # Get all gigs for this venue
-        gigs = Gig.query.filter_by(venue_id=venue.id).order_by(Gig.date_time.desc()).all()
+        # The accepted application of each gig (if any)
+        accepted_application_id = db.select(db.func.min(GigApplication.id)).where(
+            GigApplication.gig_id == Gig.id,
+            GigApplication.status == 'accepted'
+        ).correlate(Gig).scalar_subquery()
+        
+        # Include all gigs (open, accepted, completed)
+        query = db.session.query(
+            Gig.id, Gig.title, Gig.date_time, Gig.status, Ensemble.name, GigApplication.is_verified
+        ).filter(Gig.venue_id == venue.id).outerjoin(
+            GigApplication, GigApplication.id == accepted_application_id
+        ).outerjoin(Ensemble, Ensemble.id == GigApplication.ensemble_id)
+        
+        # Verified = both parties confirmed (stored on the application)
+        verified_count = db.session.query(db.func.count(db.distinct(GigApplication.gig_id))).join(
+            GigApplication.gig
+        ).filter(
+            Gig.venue_id == venue.id,
+            GigApplication.status == 'accepted',
+            GigApplication.is_verified == True
+        ).scalar()
         
-        history = []
-        verified_count = 0
+        if request.args.get('verified') == 'true':
+            query = query.filter(GigApplication.is_verified == True)
         
-        for gig in gigs:
-            # Find the accepted application (if any)
-            accepted_app = GigApplication.query.filter_by(
-                gig_id=gig.id,
-                status='accepted'
-            ).first()
-            
-            ensemble_name = None
-            is_verified = False
-            
-            if accepted_app:
-                ensemble_name = accepted_app.ensemble.name
-                
-                # Check if verified (both parties confirmed)
-                is_verified = (
-                    accepted_app.confirmed_at is not None and
-                    accepted_app.gig_happened_venue == True and
-                    accepted_app.gig_happened_ensemble == True
-                )
-                
-                if is_verified:
-                    verified_count += 1
-            
-            # Include all gigs (open, accepted, completed)
-            history.append({
-                'id': gig.id,
-                'gig_title': gig.title,
-                'date': gig.date_time.isoformat(),
+        history = [
+            {
+                'id': gig_id,
+                'gig_title': title,
+                'date': date_time.isoformat(),
                 'ensemble_name': ensemble_name,
-                'status': gig.status,  # open, accepted, completed
-                'verified': is_verified
-            })
+                'status': status,  # open, accepted, completed
+                'verified': bool(is_verified)
+            }
+            for gig_id, title, date_time, status, ensemble_name, is_verified
+            in query.order_by(Gig.date_time.desc())
+        ]
         
         return jsonify({
             'history': history,
@@ -3,10 +3,17 @@ Jam Board Blueprint
 "Looking For" posts - the homepage feed
 """
 
-from flask import Blueprint, request, jsonify, session
+import hashlib
+import json
+from flask import Blueprint, request, jsonify, session, make_response
+from cache import app_cache
 from database import db
-from models.jam_post import JamPost
+from models.jam_post import JamPost, jam_interests, jam_feed_scores, build_search_match, search_hits
 from models.user import User
+from services import feed_ranking
+from pagination import encode_cursor, decode_cursor, page_size, InvalidCursor
+from streaming import wants_stream, stream_json_list
+from sqlalchemy import or_, and_
 
 jam_board_bp = Blueprint('jam_board', __name__)
 
@@ -17,27 +24,286 @@ def get_jam_posts():
     Get all active jam posts for the feed (GLOBAL - all users)
     Sorted by most recent first
     Optional filters: location, instrument
+    Optional search: q (ranked by relevance, best match first)
+    Optional sort: sort=popular (most raised hands first, then most recent)
+                   sort=ranked (personalized for user_id, always paginated)
+    
+    Keyset pagination (enabled when `limit` or `cursor` is given):
+    returns at most `limit` posts plus an opaque `next_cursor` for the
+    following page (null on the last page)
+    
+    Streaming: ?stream=true streams the full (unpaginated) feed, bypassing
+    the cache (not available for sort=ranked, which is always paginated)
+    
+    Caching: the viewer-independent payload is cached per query string and
+    invalidated by create/delete/raise-hand; `has_raised_hand` is overlaid
+    per viewer. Responses carry an ETag and honor If-None-Match (304).
+    """
+    # Get current user ID to check "Hand Raised" status
+    current_user_id = request.args.get('user_id', type=int)
+    
+    cache = app_cache('jam_feed', 'JAM_FEED_CACHE_TTL')
+    # The viewer only changes the payload itself for the personalized ranking
+    personalized = request.args.get('sort') == 'ranked'
+    
+    if wants_stream() and not personalized:
+        return _stream_feed(current_user_id)
+    
+    cache_key = tuple(sorted(
+        (key, value) for key, value in request.args.items(multi=True)
+        if key != 'user_id' or personalized
+    ))
+    
+    cached = cache.get(cache_key)
+    if cached is None:
+        try:
+            payload = _build_feed_payload()
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        cached = cache.set(cache_key, (payload, digest))
+    payload, digest = cached
+    
+    # Per-viewer overlay: one query for the viewer's hands on this page
+    post_ids = [post['id'] for post in payload['posts']]
+    raised_post_ids = JamPost.raised_post_ids(current_user_id, post_ids)
+    
+    etag = hashlib.sha1(f"{digest}:{sorted(raised_post_ids)}".encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    
+    response = jsonify({
+        **payload,
+        'posts': [
+            {**post, 'has_raised_hand': post['id'] in raised_post_ids}
+            for post in payload['posts']
+        ]
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response, 200
+
+
+def invalidate_feed_cache():
+    """Drop cached feed payloads after a write that changes the feed"""
+    app_cache('jam_feed', 'JAM_FEED_CACHE_TTL').clear()
+
+
+def _filtered_feed_query():
+    """
+    Active posts matching the location/instrument/q filters of the request
+    Returns (query, hits) - hits is the FTS subquery when one was joined
     """
     # Optional filters
     location = request.args.get('location')
     instrument = request.args.get('instrument')
-    
-    # Get current user ID to check "Hand Raised" status
-    current_user_id = request.args.get('user_id')
+    q = request.args.get('q')
     
     # Query ALL active jam posts (multi-user global feed)
     query = JamPost.query.filter_by(is_active=True)
     
-    if location:
-        query = query.filter(JamPost.location.ilike(f'%{location}%'))
-    if instrument:
-        query = query.filter(JamPost.looking_for_instrument.ilike(f'%{instrument}%'))
+    # Text filters go through the FTS5 index (jam_posts_fts) on SQLite
+    hits = None
+    if db.engine.dialect.name == 'sqlite':
+        match = build_search_match(q=q, location=location, instrument=instrument)
+        if match:
+            hits = search_hits(match)
+            query = query.join(hits, JamPost.id == hits.c.post_id)
+    else:
+        if location:
+            query = query.filter(JamPost.location.ilike(f'%{location}%'))
+        if instrument:
+            query = query.filter(JamPost.looking_for_instrument.ilike(f'%{instrument}%'))
+        if q:
+            query = query.filter(or_(
+                JamPost.looking_for_instrument.ilike(f'%{q}%'),
+                JamPost.genre.ilike(f'%{q}%'),
+                JamPost.location.ilike(f'%{q}%'),
+                JamPost.description.ilike(f'%{q}%')
+            ))
     
-    posts = query.order_by(JamPost.created_at.desc()).all()
+    return query, hits
+
+
+def _stream_feed(current_user_id):
+    """Stream every post matching the filters, in feed order"""
+    query, hits = _filtered_feed_query()
     
-    return jsonify({
-        'posts': [post.to_dict(current_user_id=current_user_id) for post in posts]
-    }), 200
+    if request.args.get('q') and hits is not None:
+        query = query.order_by(hits.c.rank, JamPost.created_at.desc(), JamPost.id.desc())
+    elif request.args.get('sort') == 'popular':
+        query = query.order_by(JamPost.interest_count.desc(), JamPost.created_at.desc(), JamPost.id.desc())
+    else:
+        query = query.order_by(JamPost.created_at.desc(), JamPost.id.desc())
+    
+    return stream_json_list(
+        'posts', query,
+        lambda posts: JamPost.feed_to_dicts(posts, current_user_id)
+    )
+
+
+def _build_feed_payload():
+    """
+    Build the viewer-independent feed payload for the current query string
+    (every has_raised_hand is False; get_jam_posts overlays the viewer's)
+    Raises InvalidCursor for a malformed cursor
+    """
+    query, hits = _filtered_feed_query()
+    q = request.args.get('q')
+    
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    popular = request.args.get('sort') == 'popular'
+    viewer_id = request.args.get('user_id', type=int)
+    
+    if q and hits is not None:
+        return _search_page(query, hits, limit, cursor)
+    
+    if request.args.get('sort') == 'ranked' and viewer_id:
+        return _ranked_page(query, viewer_id, limit, cursor)
+    
+    if popular:
+        # interest_count is stored on the post, so no join is needed to sort
+        query = query.order_by(JamPost.interest_count.desc(), JamPost.created_at.desc(), JamPost.id.desc())
+    else:
+        query = query.order_by(JamPost.created_at.desc(), JamPost.id.desc())
+    
+    if limit is None and not cursor:
+        # Legacy mode: the whole feed in one response
+        posts = query.all()
+        
+        # Batched serialization: fixed number of queries regardless of feed size
+        return {'posts': JamPost.feed_to_dicts(posts)}
+    
+    # Keyset mode: continue from the sort key of the last post we returned
+    if cursor:
+        if popular:
+            cursor_count, cursor_created_at, cursor_id = decode_cursor(cursor, 3)
+        else:
+            cursor_created_at, cursor_id = decode_cursor(cursor, 2)
+        
+        after_cursor = or_(
+            JamPost.created_at < cursor_created_at,
+            and_(JamPost.created_at == cursor_created_at, JamPost.id < cursor_id)
+        )
+        if popular:
+            after_cursor = or_(
+                JamPost.interest_count < cursor_count,
+                and_(JamPost.interest_count == cursor_count, after_cursor)
+            )
+        query = query.filter(after_cursor)
+    
+    limit = page_size(limit)
+    posts = query.limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        last = posts[-1]
+        if popular:
+            next_cursor = encode_cursor(last.interest_count, last.created_at, last.id)
+        else:
+            next_cursor = encode_cursor(last.created_at, last.id)
+    
+    return {
+        'posts': JamPost.feed_to_dicts(posts),
+        'next_cursor': next_cursor
+    }
+
+
+def _search_page(query, hits, limit, cursor):
+    """
+    One page of ranked search results, most relevant first
+    Keyset on (rank, created_at, id); always paginated
+    """
+    if cursor:
+        cursor_rank, cursor_created_at, cursor_id = decode_cursor(cursor, 3)
+        query = query.filter(or_(
+            hits.c.rank > cursor_rank,
+            and_(hits.c.rank == cursor_rank, or_(
+                JamPost.created_at < cursor_created_at,
+                and_(JamPost.created_at == cursor_created_at, JamPost.id < cursor_id)
+            ))
+        ))
+    
+    limit = page_size(limit)
+    rows = query.add_columns(hits.c.rank).order_by(
+        hits.c.rank, JamPost.created_at.desc(), JamPost.id.desc()
+    ).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_post, last_rank = rows[-1]
+        next_cursor = encode_cursor(last_rank, last_post.created_at, last_post.id)
+    
+    return {
+        'posts': JamPost.feed_to_dicts([post for post, _ in rows]),
+        'next_cursor': next_cursor
+    }
+
+
+def _ranked_page(query, viewer_id, limit, cursor):
+    """
+    One page of the viewer's precomputed "For You" ranking
+    Matched posts (a stored score) by score, read from the (user_id, score)
+    index; then every other active post by recency, read from the active
+    created_at index and skipping posts the viewer has a score for
+    
+    The cursor is (tier, sort value, id): tier 0 continues by score,
+    tier 1 by created_at among the unmatched posts.
+    """
+    score = jam_feed_scores.c.score
+    cursor_tier = 0
+    if cursor:
+        cursor_tier, cursor_value, cursor_id = decode_cursor(cursor, 3)
+    
+    limit = page_size(limit)
+    rows = []
+    
+    if cursor_tier == 0:
+        matched = query.join(jam_feed_scores, and_(
+            jam_feed_scores.c.jam_post_id == JamPost.id,
+            jam_feed_scores.c.user_id == viewer_id
+        )).add_columns(score)
+        if cursor:
+            matched = matched.filter(or_(
+                score < cursor_value,
+                and_(score == cursor_value, JamPost.id < cursor_id)
+            ))
+        rows = matched.order_by(score.desc(), JamPost.id.desc()).limit(limit + 1).all()
+    
+    if len(rows) <= limit:
+        # Matched posts ran out: fill the page from the unmatched tail
+        unmatched = query.filter(~db.exists().where(
+            jam_feed_scores.c.user_id == viewer_id,
+            jam_feed_scores.c.jam_post_id == JamPost.id
+        ))
+        if cursor_tier == 1:
+            unmatched = unmatched.filter(or_(
+                JamPost.created_at < cursor_value,
+                and_(JamPost.created_at == cursor_value, JamPost.id < cursor_id)
+            ))
+        rows += [(post, None) for post in unmatched.order_by(
+            JamPost.created_at.desc(), JamPost.id.desc()
+        ).limit(limit + 1 - len(rows))]
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_post, last_score = rows[-1]
+        if last_score is None:
+            next_cursor = encode_cursor(1, last_post.created_at, last_post.id)
+        else:
+            next_cursor = encode_cursor(0, last_score, last_post.id)
+    
+    return {
+        'posts': JamPost.feed_to_dicts([post for post, _ in rows]),
+        'next_cursor': next_cursor
+    }
+
 
 
 @jam_board_bp.route('/', methods=['POST'])
@@ -76,7 +342,13 @@ def create_jam_post():
     )
     
     db.session.add(post)
+    db.session.flush()
+    
+    # Precompute "For You" scores for matching musicians in the same transaction
+    feed_ranking.score_new_post(post)
+    
     db.session.commit()
+    invalidate_feed_cache()
     
     return jsonify({
         'message': 'Jam post created',
@@ -104,21 +376,38 @@ def raise_hand(post_id):
         return jsonify({'error': 'User not found'}), 404
 
     # Logic: Toggle the hand raise
-    if user in post.interested_musicians:
-        post.interested_musicians.remove(user)
+    # Primary-key lookup on jam_interests instead of scanning interested_musicians,
+    # then a single insert/delete. interest_count is adjusted in SQL (not
+    # read-modify-write) in the same transaction.
+    already_raised = db.session.query(jam_interests.c.user_id).filter_by(
+        jam_post_id=post.id, user_id=user.id
+    ).first() is not None
+    
+    if already_raised:
+        db.session.execute(jam_interests.delete().where(
+            jam_interests.c.jam_post_id == post.id,
+            jam_interests.c.user_id == user.id
+        ))
+        post.interest_count = db.case(
+            (JamPost.interest_count > 0, JamPost.interest_count - 1), else_=0
+        )
         action = "removed"
         has_raised = False
     else:
-        post.interested_musicians.append(user)
+        db.session.execute(jam_interests.insert().values(
+            jam_post_id=post.id, user_id=user.id
+        ))
+        post.interest_count = JamPost.interest_count + 1
         action = "added"
         has_raised = True
 
     db.session.commit()
+    invalidate_feed_cache()
     
     return jsonify({
         'message': f'Hand {action}', 
         'has_raised_hand': has_raised,
-        'count': post.interested_musicians.count()
+        'count': post.interest_count
     }), 200
 
 
@@ -161,6 +450,8 @@ def delete_jam_post(post_id):
         return jsonify({'error': 'Post not found'}), 404
     
     post.is_active = False
+    feed_ranking.drop_post(post.id)
     db.session.commit()
+    invalidate_feed_cache()
     
     return jsonify({'message': 'Post closed'}), 200
\ No newline at end of file
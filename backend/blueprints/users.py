@@ -6,6 +6,9 @@ Musician profile management
 from flask import Blueprint, request, jsonify
 from database import db
 from models.user import User
+from services import feed_ranking
+from blueprints.jam_board import invalidate_feed_cache
+from streaming import wants_stream, stream_json_list
 
 users_bp = Blueprint('users', __name__)
 
@@ -40,10 +43,15 @@ def update_user(user_id):
         user.bio = data['bio']
     if 'vibe_tags' in data:
         user.vibe_tags = data['vibe_tags']  # Comma-separated string
+        # Genre overlap feeds the "For You" jam ranking
+        feed_ranking.rescore_user(user)
     if 'is_active' in data:
         user.is_active = data['is_active']
     
     db.session.commit()
+    if 'vibe_tags' in data:
+        # Cached ranked pages for this viewer are now stale
+        invalidate_feed_cache()
     
     return jsonify({
         'message': 'Profile updated',
@@ -55,6 +63,7 @@ def update_user(user_id):
 def search_users():
     """
     Search users by instrument, city, or vibe tags
+    ?stream=true streams the list instead of building it in memory
     TODO: Add more advanced filtering if needed
     """
     instrument = request.args.get('instrument')
@@ -68,6 +77,12 @@ def search_users():
     if city:
         query = query.filter(User.city.ilike(f'%{city}%'))
     
+    if wants_stream():
+        return stream_json_list(
+            'users', query.order_by(User.id),
+            lambda users: [user.to_dict() for user in users]
+        )
+    
     users = query.all()
     
     return jsonify({
@@ -0,0 +1,60 @@
+"""
+In-process caching
+Small TTL caches that live on the Flask app (one set per app instance)
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from flask import current_app
+
+
+class TTLCache:
+    """
+    Thread-safe dict with per-entry expiry and a size bound
+    Oldest entries are evicted first once max_entries is reached
+    """
+
+    def __init__(self, ttl, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def app_cache(name, ttl_setting, max_entries=256):
+    """
+    Get (or lazily create) the named cache for the current app
+    ttl_setting is the config key holding its TTL in seconds
+    """
+    caches = current_app.extensions.setdefault('ensembl_caches', {})
+    if name not in caches:
+        caches[name] = TTLCache(current_app.config[ttl_setting], max_entries)
+    return caches[name]
@@ -24,5 +24,39 @@ class Config:
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID') or 'your-google-client-id'
     GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET') or 'your-google-client-secret'
     
+    # Jam Board feed cache (seconds) - writes in this process invalidate it
+    # immediately; the TTL bounds staleness from other processes/jobs
+    JAM_FEED_CACHE_TTL = int(os.environ.get('JAM_FEED_CACHE_TTL', 30))
+    
+    # Jam post archival (python maintenance.py archive-jam-posts)
+    # Closed posts, and open posts older than this many days, leave the live table
+    JAM_POST_ARCHIVE_AFTER_DAYS = int(os.environ.get('JAM_POST_ARCHIVE_AFTER_DAYS', 90))
+    JAM_POST_ARCHIVE_BATCH_SIZE = int(os.environ.get('JAM_POST_ARCHIVE_BATCH_SIZE', 500))
+    
+    # Cached per-user ensemble membership (services/membership.py); writers
+    # invalidate on change, the TTL only bounds staleness from other processes
+    ENSEMBLE_MEMBERSHIP_CACHE_TTL = int(os.environ.get('ENSEMBLE_MEMBERSHIP_CACHE_TTL', 300))
+    
+    # Chat history page size (GET /api/chat/messages/...)
+    CHAT_PAGE_SIZE = int(os.environ.get('CHAT_PAGE_SIZE', 50))
+    
+    # Chat cold storage: messages older than this (and already read) are
+    # packed into compressed per-conversation chunks by
+    # `python maintenance.py archive-messages`
+    CHAT_ARCHIVE_AFTER_DAYS = int(os.environ.get('CHAT_ARCHIVE_AFTER_DAYS', 365))
+    CHAT_ARCHIVE_CHUNK_SIZE = int(os.environ.get('CHAT_ARCHIVE_CHUNK_SIZE', 500))
+    
+    # Group commit for chat sends: sends arriving within this many ms share
+    # one transaction (0 = commit each send on its own)
+    CHAT_GROUP_COMMIT_WINDOW_MS = int(os.environ.get('CHAT_GROUP_COMMIT_WINDOW_MS', 0))
+    CHAT_GROUP_COMMIT_MAX_BATCH = int(os.environ.get('CHAT_GROUP_COMMIT_MAX_BATCH', 100))
+    # How long a known user id is trusted without a lookup (seconds)
+    CHAT_USER_CACHE_TTL = int(os.environ.get('CHAT_USER_CACHE_TTL', 300))
+    
+    # Live chat updates: SSE keep-alive interval and the longest a
+    # long-poll request may wait for an event (seconds)
+    CHAT_STREAM_HEARTBEAT = int(os.environ.get('CHAT_STREAM_HEARTBEAT', 15))
+    CHAT_POLL_TIMEOUT = int(os.environ.get('CHAT_POLL_TIMEOUT', 25))
+    
     # File upload settings (not used in MVP, but keeping for future)
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
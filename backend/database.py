@@ -15,12 +15,40 @@ def init_db():
     Creates all tables based on models
     """
     from models.user import User
-    from models.jam_post import JamPost
-    from models.message import Message
+    from models.jam_post import (
+        JamPost, jam_feed_scores, jam_posts_archive, jam_interests_archive, ensure_search_index
+    )
+    from models.message import (
+        Message, message_unread_counts, message_unread_totals, message_read_markers,
+        message_archive_chunks
+    )
     from models.ensemble import Ensemble, ensemble_members
     from models.venue import Venue
-    from models.gig import Gig, GigApplication
+    from models.gig import Gig, GigApplication, GigEvent
     
     # Create all tables
     db.create_all()
+    ensure_search_index()
     print("✓ Database tables created successfully")
+
+
+def create_missing_indexes():
+    """
+    Create the model-declared indexes an existing database lacks
+    (create_all only adds indexes together with a new table)
+    Indexes on columns a database doesn't have yet are skipped; run the
+    column migrations first. Returns the names of the indexes created
+    """
+    inspector = db.inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in existing or not {column.name for column in index.columns} <= columns:
+                continue
+            index.create(db.engine)
+            created.append(index.name)
+    return created
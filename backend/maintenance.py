@@ -0,0 +1,140 @@
+"""
+Maintenance Script
+Repairs denormalized data and runs housekeeping jobs
+
+Usage:
+    python maintenance.py <command>
+
+Commands:
+    rebuild-interest-counts   Add/recompute JamPost.interest_count from jam_interests
+    archive-jam-posts         Move closed/stale jam posts into the archive tables
+                              [--days N] [--batch-size N] (defaults from config)
+    migrate-conversation-keys Add/backfill Message.conversation_key [--batch-size N]
+    rebuild-unread-counters   Recompute the per-user/per-conversation unread counters
+    migrate-read-markers      Seed read markers from legacy Message.is_read flags
+    archive-messages          Move old, read chat messages into compressed archive chunks
+                              [--days N] [--batch-size N] (defaults from config)
+    backfill-verified-gigs    Add/recompute GigApplication.is_verified
+    create-indexes            Create model indexes missing from an older database
+    rebuild-jam-posts-table   Rebuild jam_posts with AUTOINCREMENT so archived ids are never reused
+"""
+
+import argparse
+import sys
+from app import create_app
+
+
+def rebuild_interest_counts(args):
+    """Recompute stored hand-raise counts on jam posts"""
+    from models.jam_post import rebuild_interest_counts as rebuild
+
+    fixed = rebuild()
+    print(f"✅ Interest counts rebuilt ({fixed} posts corrected)")
+
+
+def archive_jam_posts(args):
+    """Move closed or stale jam posts out of the live feed table"""
+    from flask import current_app
+    from services.jam_archive import archive_stale_jam_posts
+
+    days = args.days or current_app.config['JAM_POST_ARCHIVE_AFTER_DAYS']
+    batch_size = args.batch_size or current_app.config['JAM_POST_ARCHIVE_BATCH_SIZE']
+    archived = archive_stale_jam_posts(days, batch_size)
+    print(f"✅ Archived {archived} jam posts (closed or older than {days} days)")
+
+
+def migrate_conversation_keys(args):
+    """Add and backfill the canonical conversation key on messages"""
+    from models.message import migrate_conversation_keys as migrate
+
+    backfilled = migrate(args.batch_size or 1000)
+    print(f"✅ Conversation keys backfilled on {backfilled} messages")
+
+
+def rebuild_unread_counters(args):
+    """Recompute the unread message counters from messages"""
+    from models.message import rebuild_unread_counters as rebuild
+
+    users = rebuild()
+    print(f"✅ Unread counters rebuilt ({users} users with unread messages)")
+
+
+def migrate_read_markers(args):
+    """Convert per-row read flags into high-water read markers"""
+    from models.message import migrate_read_markers as migrate
+
+    created = migrate()
+    print(f"✅ Read markers created for {created} conversations (unread counters rebuilt)")
+
+
+def archive_messages(args):
+    """Move old chat history into cold storage"""
+    from flask import current_app
+    from services.chat_archive import archive_old_messages
+
+    days = args.days or current_app.config['CHAT_ARCHIVE_AFTER_DAYS']
+    chunk_size = args.batch_size or current_app.config['CHAT_ARCHIVE_CHUNK_SIZE']
+    archived = archive_old_messages(days, chunk_size)
+    print(f"✅ Archived {archived} messages (read and older than {days} days)")
+
+
+def backfill_verified_gigs(args):
+    """Store the verified flag on gig applications"""
+    from models.gig import backfill_is_verified
+
+    verified = backfill_is_verified()
+    print(f"✅ Verification flags backfilled ({verified} verified applications)")
+
+
+def create_indexes(args):
+    """Add indexes declared on the models to an existing database"""
+    from database import create_missing_indexes
+
+    created = create_missing_indexes()
+    print(f"✅ Created {len(created)} missing indexes" + (f": {', '.join(created)}" if created else ""))
+
+
+def rebuild_jam_posts_table(args):
+    """Give an older jam_posts table AUTOINCREMENT ids and its indexes"""
+    from models.jam_post import rebuild_with_autoincrement
+
+    if rebuild_with_autoincrement():
+        print("✅ jam_posts rebuilt with AUTOINCREMENT (ids start past the archive)")
+    else:
+        print("✅ jam_posts already uses AUTOINCREMENT (indexes and id sequence checked)")
+
+
+COMMANDS = {
+    'rebuild-interest-counts': rebuild_interest_counts,
+    'archive-jam-posts': archive_jam_posts,
+    'migrate-conversation-keys': migrate_conversation_keys,
+    'rebuild-unread-counters': rebuild_unread_counters,
+    'migrate-read-markers': migrate_read_markers,
+    'archive-messages': archive_messages,
+    'backfill-verified-gigs': backfill_verified_gigs,
+    'create-indexes': create_indexes,
+    'rebuild-jam-posts-table': rebuild_jam_posts_table,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ensembl maintenance tasks')
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--days', type=int, help='Age threshold for archival commands')
+    parser.add_argument('--batch-size', type=int, help='Rows per transaction for batch commands')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        COMMANDS[args.command](args)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+        sys.exit(0)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -11,7 +11,9 @@ from datetime import datetime
 ensemble_members = db.Table('ensemble_members',
     db.Column('ensemble_id', db.Integer, db.ForeignKey('ensembles.id'), primary_key=True),
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
-    db.Column('joined_at', db.DateTime, default=datetime.utcnow)
+    db.Column('joined_at', db.DateTime, default=datetime.utcnow),
+    # The primary key leads with ensemble_id; membership lookups go by user
+    db.Index('ix_ensemble_members_user_id_ensemble_id', 'user_id', 'ensemble_id')
 )
 
 # NEW: Association table for PENDING invites
@@ -30,7 +32,7 @@ class Ensemble(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    leader_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # Who created it
+    leader_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)  # Who created it
     
     # Description field for ensemble (added for better UX)
     description = db.Column(db.Text, nullable=True)
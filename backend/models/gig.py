@@ -5,6 +5,8 @@ Gig postings and applications
 
 from database import db
 from datetime import datetime
+from sqlalchemy.orm import selectinload
+from models.ensemble import Ensemble, ensemble_members, ensemble_invites
 
 
 class Gig(db.Model):
@@ -12,6 +14,10 @@ class Gig(db.Model):
     Gig posting from a venue
     """
     __tablename__ = 'gigs'
+    __table_args__ = (
+        # Gig board: open gigs in date order, optionally within a date window
+        db.Index('ix_gigs_is_open_date_time', 'is_open', 'date_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
@@ -66,6 +72,10 @@ class GigApplication(db.Model):
     Gig Handshake: venue accepts, chat opens, post-gig confirmation
     """
     __tablename__ = 'gig_applications'
+    __table_args__ = (
+        # A gig's applications by status (accepted ensemble lookups)
+        db.Index('ix_gig_applications_gig_id_status', 'gig_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     gig_id = db.Column(db.Integer, db.ForeignKey('gigs.id'), nullable=False)
@@ -81,6 +91,8 @@ class GigApplication(db.Model):
     gig_happened_venue = db.Column(db.Boolean, nullable=True)
     gig_happened_ensemble = db.Column(db.Boolean, nullable=True)
     confirmed_at = db.Column(db.DateTime, nullable=True)
+    # Both sides confirmed the gig happened (stored by settle_confirmation)
+    is_verified = db.Column(db.Boolean, nullable=False, default=False, index=True)
     
     # Metadata
     applied_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -89,13 +101,17 @@ class GigApplication(db.Model):
     gig = db.relationship('Gig', back_populates='applications')
     ensemble = db.relationship('Ensemble', back_populates='gig_applications')
     
-    def to_dict(self):
-        """Convert application to JSON-serializable dict"""
+    def to_dict(self, ensemble=None):
+        """
+        Convert application to JSON-serializable dict
+        ensemble: precomputed ensemble dict (see listing_to_dicts);
+        defaults to the full Ensemble.to_dict()
+        """
         return {
             'id': self.id,
             'gig_id': self.gig_id,
             'ensemble_id': self.ensemble_id,
-            'ensemble': self.ensemble.to_dict(), # <--- I ADDED THIS LINE BACK
+            'ensemble': ensemble if ensemble is not None else self.ensemble.to_dict(),
             'status': self.status,
             'musician_acknowledged': self.musician_acknowledged,
             'gig_happened_venue': self.gig_happened_venue,
@@ -103,5 +119,156 @@ class GigApplication(db.Model):
             'applied_at': self.applied_at.isoformat()
         }
     
+    def settle_confirmation(self):
+        """
+        Call after recording either side's answer. Once both have answered,
+        stamps confirmed_at and stores is_verified.
+        Returns the change to apply to the verified counts: 1 if this call
+        verified the gig, -1 if a changed answer un-verified it, else 0
+        """
+        if self.gig_happened_venue is None or self.gig_happened_ensemble is None:
+            return 0
+        self.confirmed_at = datetime.utcnow()
+        was_verified = bool(self.is_verified)
+        self.is_verified = bool(self.gig_happened_venue and self.gig_happened_ensemble)
+        return int(self.is_verified) - int(was_verified)
+    
+    @staticmethod
+    def listing_to_dicts(query, view='full'):
+        """
+        Serialize the applications from `query` in a fixed number of queries
+        
+        - full: each ensemble with its members and pending invites, as
+          Ensemble.to_dict() (ensembles, members and invites selectin-loaded)
+        - summary: ensemble id/name/leader with member and invite counts
+          (for dashboards that only list who applied)
+        """
+        if view == 'summary':
+            applications = query.options(selectinload(GigApplication.ensemble)).all()
+            ensemble_ids = {application.ensemble_id for application in applications}
+            member_counts = _count_by_ensemble(ensemble_members, ensemble_ids)
+            invite_counts = _count_by_ensemble(ensemble_invites, ensemble_ids)
+            return [
+                application.to_dict(ensemble={
+                    'id': application.ensemble.id,
+                    'name': application.ensemble.name,
+                    'leader_id': application.ensemble.leader_id,
+                    'verified_gig_count': application.ensemble.verified_gig_count,
+                    'member_count': member_counts.get(application.ensemble_id, 0),
+                    'invited_count': invite_counts.get(application.ensemble_id, 0)
+                })
+                for application in applications
+            ]
+        
+        applications = query.options(
+            selectinload(GigApplication.ensemble).selectinload(Ensemble.members),
+            selectinload(GigApplication.ensemble).selectinload(Ensemble.invited_users)
+        ).all()
+        return [application.to_dict() for application in applications]
+    
     def __repr__(self):
-        return f'<GigApplication {self.ensemble.name} -> Gig {self.gig_id}>'
\ No newline at end of file
+        return f'<GigApplication {self.ensemble.name} -> Gig {self.gig_id}>'
+
+
+class GigEvent(db.Model):
+    """
+    Append-only log of gig lifecycle transitions
+    
+    Written in the same transaction as the transition itself, so consumers
+    (history, analytics, notifications) can follow `id` as a sequence
+    number and apply changes incrementally instead of rescanning gigs.
+    """
+    __tablename__ = 'gig_events'
+    __table_args__ = (
+        db.Index('ix_gig_events_gig_id_id', 'gig_id', 'id'),
+        db.Index('ix_gig_events_venue_id_id', 'venue_id', 'id'),
+        db.Index('ix_gig_events_ensemble_id_id', 'ensemble_id', 'id'),
+        # Never reuse a sequence number
+        {'sqlite_autoincrement': True},
+    )
+    
+    TYPES = (
+        'applied', 'accepted', 'rejected', 'venue_completed',
+        'ensemble_completed', 'confirmed', 'verified', 'unverified'
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)  # Sequence number
+    event_type = db.Column(db.String(30), nullable=False)
+    gig_id = db.Column(db.Integer, db.ForeignKey('gigs.id'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
+    application_id = db.Column(db.Integer, db.ForeignKey('gig_applications.id'), nullable=True)
+    ensemble_id = db.Column(db.Integer, db.ForeignKey('ensembles.id'), nullable=True)
+    details = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @staticmethod
+    def record(event_type, gig, application=None, **details):
+        """Append an event for a transition (commits with the caller's transaction)"""
+        if event_type not in GigEvent.TYPES:
+            raise ValueError(f'Unknown gig event type: {event_type}')
+        if application is not None and application.id is None:
+            db.session.flush()
+        event = GigEvent(
+            event_type=event_type,
+            gig_id=gig.id,
+            venue_id=gig.venue_id,
+            application_id=application.id if application is not None else None,
+            ensemble_id=application.ensemble_id if application is not None else None,
+            details=details or None
+        )
+        db.session.add(event)
+        return event
+    
+    def to_dict(self):
+        """Convert event to JSON-serializable dict"""
+        return {
+            'seq': self.id,
+            'event_type': self.event_type,
+            'gig_id': self.gig_id,
+            'venue_id': self.venue_id,
+            'application_id': self.application_id,
+            'ensemble_id': self.ensemble_id,
+            'details': self.details or {},
+            'created_at': self.created_at.isoformat()
+        }
+
+
+def _count_by_ensemble(association, ensemble_ids):
+    """{ensemble_id: rows} for an ensemble association table"""
+    if not ensemble_ids:
+        return {}
+    return dict(
+        db.session.query(association.c.ensemble_id, db.func.count())
+        .filter(association.c.ensemble_id.in_(ensemble_ids))
+        .group_by(association.c.ensemble_id)
+    )
+
+
+def backfill_is_verified():
+    """
+    Add gig_applications.is_verified to databases created before it existed,
+    then recompute it from the confirmation columns
+    Returns the number of verified applications
+    """
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('gig_applications')}
+    if 'is_verified' not in columns:
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "ALTER TABLE gig_applications ADD COLUMN is_verified BOOLEAN NOT NULL DEFAULT 0"
+            )
+            connection.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_gig_applications_is_verified "
+                "ON gig_applications (is_verified)"
+            )
+    
+    verified = db.and_(
+        GigApplication.confirmed_at.isnot(None),
+        GigApplication.gig_happened_venue == True,
+        GigApplication.gig_happened_ensemble == True
+    )
+    GigApplication.query.update(
+        {GigApplication.is_verified: db.case((verified, True), else_=False)},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return GigApplication.query.filter_by(is_verified=True).count()
@@ -3,8 +3,11 @@ Jam Post Model
 Represents "Looking For" posts on the Jam Board
 """
 
+import re
 from database import db
 from datetime import datetime
+from sqlalchemy import event, text, DDL, table, column
+from sqlalchemy.schema import CreateTable
 
 # 1. Association table to track "Hand Raises"
 jam_interests = db.Table('jam_interests',
@@ -13,12 +16,53 @@ jam_interests = db.Table('jam_interests',
     db.Column('timestamp', db.DateTime, default=datetime.now)
 )
 
+# Precomputed "For You" ranking candidates (see services/feed_ranking.py)
+jam_feed_scores = db.Table('jam_feed_scores',
+    db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
+    db.Column('jam_post_id', db.Integer, db.ForeignKey('jam_posts.id'), primary_key=True),
+    db.Column('score', db.Float, nullable=False),
+    db.Index('ix_jam_feed_scores_user_score', 'user_id', 'score')
+)
+
+# Cold storage for closed/stale posts and their hand raises
+# (filled by services/jam_archive.py; same columns plus archived_at)
+jam_posts_archive = db.Table('jam_posts_archive',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('author_id', db.Integer, db.ForeignKey('users.id'), nullable=False),
+    db.Column('looking_for_instrument', db.String(50), nullable=False),
+    db.Column('genre', db.String(50), nullable=True),
+    db.Column('location', db.String(100), nullable=False),
+    db.Column('description', db.Text, nullable=False),
+    db.Column('created_at', db.DateTime),
+    db.Column('is_active', db.Boolean),
+    db.Column('interest_count', db.Integer, nullable=False, default=0),
+    db.Column('archived_at', db.DateTime, default=datetime.now, index=True)
+)
+
+jam_interests_archive = db.Table('jam_interests_archive',
+    db.Column('jam_post_id', db.Integer, db.ForeignKey('jam_posts_archive.id'), primary_key=True),
+    db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
+    db.Column('timestamp', db.DateTime)
+)
+
 class JamPost(db.Model):
     """
     Posts on the Jam Board (homepage)
     Musicians looking for other musicians to jam with
     """
     __tablename__ = 'jam_posts'
+    __table_args__ = (
+        # Partial index: the live feed only ever reads active posts, so this
+        # stays small no matter how many closed posts accumulate
+        db.Index(
+            'ix_jam_posts_active_created_at', 'created_at', 'id',
+            sqlite_where=db.text('is_active = 1'),
+            postgresql_where=db.text('is_active')
+        ),
+        # Archived posts keep their id in jam_posts_archive, so an id must
+        # never be handed out again after the hot row is deleted
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -33,6 +77,10 @@ class JamPost(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.now, index=True)
     is_active = db.Column(db.Boolean, default=True)  # Can be closed by author
     
+    # Denormalized number of rows in jam_interests for this post
+    # Maintained by raise_hand; rebuild with `python maintenance.py rebuild-interest-counts`
+    interest_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    
     # Relationships
     author = db.relationship('User', back_populates='jam_posts')
     
@@ -53,13 +101,59 @@ class JamPost(db.Model):
             # Check if current_user_id is in the interested_musicians list
             has_raised_hand = self.interested_musicians.filter_by(id=current_user_id).first() is not None
 
+        return self._build_dict(self.author, has_raised_hand, self.interest_count)
+    
+    @staticmethod
+    def feed_to_dicts(posts, current_user_id=None):
+        """
+        Serialize a page of posts for the feed in bulk
+        Authors and the viewer's hand raises are each loaded with one query and
+        counts come from the stored interest_count, so the number of queries
+        does not grow with the feed
+        """
+        from models.user import User
+        
+        post_ids = [post.id for post in posts]
+        if not post_ids:
+            return []
+        
+        # 1. Authors for the whole page in one query
+        author_ids = {post.author_id for post in posts}
+        authors = {
+            user.id: user
+            for user in User.query.filter(User.id.in_(author_ids))
+        }
+        
+        # 2. The viewer's raised hands across the whole page
+        raised_post_ids = JamPost.raised_post_ids(current_user_id, post_ids)
+        
+        return [
+            post._build_dict(authors.get(post.author_id), post.id in raised_post_ids, post.interest_count)
+            for post in posts
+        ]
+    
+    @staticmethod
+    def raised_post_ids(user_id, post_ids):
+        """Set of post_ids the user has raised a hand on (one query)"""
+        if not user_id or not post_ids:
+            return set()
+        return {
+            post_id for (post_id,) in
+            db.session.query(jam_interests.c.jam_post_id).filter(
+                jam_interests.c.user_id == user_id,
+                jam_interests.c.jam_post_id.in_(post_ids)
+            )
+        }
+    
+    def _build_dict(self, author, has_raised_hand, interest_count):
+        """Shared dict layout for to_dict and feed_to_dicts"""
         return {
             'id': self.id,
             'author': {
-                'id': self.author.id,
-                'name': self.author.name if self.author else "Unknown",
-                # FIX IS HERE: Use self.author.instrument directly
-                'instrument': self.author.instrument if self.author else "Musician",
+                'id': self.author_id,
+                'name': author.name if author else "Unknown",
+                # FIX IS HERE: Use author.instrument directly
+                'instrument': author.instrument if author else "Musician",
                 # 'photo_url': self.author.photo_url # handled by frontend placeholder for now
             },
             'looking_for_instrument': self.looking_for_instrument,
@@ -71,8 +165,201 @@ class JamPost(db.Model):
             
             # New fields for the UI
             'has_raised_hand': has_raised_hand,
-            'interest_count': self.interested_musicians.count()
+            'interest_count': interest_count
         }
     
     def __repr__(self):
-        return f'<JamPost: Looking for {self.looking_for_instrument}>'
\ No newline at end of file
+        return f'<JamPost: Looking for {self.looking_for_instrument}>'
+
+
+def rebuild_interest_counts():
+    """
+    Recompute JamPost.interest_count from jam_interests
+    Adds the column (and its index) to databases created before it existed,
+    then repairs drift from writes that bypassed raise_hand; returns rows fixed
+    """
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('jam_posts')}
+    if 'interest_count' not in columns:
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "ALTER TABLE jam_posts ADD COLUMN interest_count INTEGER NOT NULL DEFAULT 0"
+            )
+            connection.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_jam_posts_interest_count "
+                "ON jam_posts (interest_count)"
+            )
+    
+    actual = db.select(db.func.count()).where(
+        jam_interests.c.jam_post_id == JamPost.id
+    ).scalar_subquery()
+    
+    fixed = JamPost.query.filter(JamPost.interest_count != actual).update(
+        {JamPost.interest_count: actual}, synchronize_session=False
+    )
+    db.session.commit()
+    return fixed
+
+
+def rebuild_with_autoincrement():
+    """
+    Rebuild a pre-AUTOINCREMENT jam_posts table so archived ids are never reused
+    Copies every row (ids kept, so hand raises, feed scores and jam_posts_fts
+    stay valid), recreates the table's indexes (including the partial
+    ix_jam_posts_active_created_at) and seeds sqlite_sequence past the highest
+    archived id. Returns True if the table was rebuilt.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('jam_posts')}
+    if 'interest_count' not in columns:
+        rebuild_interest_counts()
+    
+    with db.engine.begin() as connection:
+        ddl = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'jam_posts'"
+        ).scalar()
+        rebuilt = 'AUTOINCREMENT' not in ddl.upper()
+        
+        if rebuilt:
+            # SQLite cannot alter a primary key: copy into a new table and swap it in
+            # (foreign keys are not enforced, so jam_interests survives the drop)
+            names = ', '.join(column.name for column in JamPost.__table__.columns)
+            create = str(CreateTable(JamPost.__table__).compile(connection))
+            connection.exec_driver_sql(
+                create.replace('CREATE TABLE jam_posts ', 'CREATE TABLE jam_posts_new ', 1)
+            )
+            connection.exec_driver_sql(
+                f"INSERT INTO jam_posts_new ({names}) SELECT {names} FROM jam_posts"
+            )
+            connection.exec_driver_sql("DROP TABLE jam_posts")
+            connection.exec_driver_sql("ALTER TABLE jam_posts_new RENAME TO jam_posts")
+        
+        for index in JamPost.__table__.indexes:
+            index.create(connection, checkfirst=True)
+        
+        # Ids already handed out live on in the archive, so start past them
+        next_id = connection.exec_driver_sql(
+            "SELECT max(coalesce((SELECT max(id) FROM jam_posts), 0), "
+            "coalesce((SELECT max(id) FROM jam_posts_archive), 0), "
+            "coalesce((SELECT seq FROM sqlite_sequence WHERE name = 'jam_posts'), 0))"
+        ).scalar()
+        connection.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'jam_posts'")
+        connection.exec_driver_sql(
+            "INSERT INTO sqlite_sequence (name, seq) VALUES ('jam_posts', ?)", (next_id,)
+        )
+    return rebuilt
+
+
+# ===== FULL-TEXT SEARCH (SQLite FTS5) =====
+# jam_posts_fts mirrors the searchable columns of ACTIVE posts, keyed by
+# rowid = jam_posts.id. It is created/dropped together with jam_posts and
+# kept in sync by the mapper events below (create, close, re-open, delete).
+
+SEARCH_COLUMNS = ('looking_for_instrument', 'genre', 'location', 'description')
+
+jam_posts_fts = table('jam_posts_fts', column('rowid'))
+
+CREATE_SEARCH_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS jam_posts_fts "
+    "USING fts5(looking_for_instrument, genre, location, description)"
+)
+
+event.listen(JamPost.__table__, 'after_create',
+             DDL(CREATE_SEARCH_INDEX).execute_if(dialect='sqlite'))
+event.listen(JamPost.__table__, 'before_drop',
+             DDL("DROP TABLE IF EXISTS jam_posts_fts").execute_if(dialect='sqlite'))
+
+
+def _unindex_post(connection, post_id):
+    connection.execute(text("DELETE FROM jam_posts_fts WHERE rowid = :id"), {'id': post_id})
+
+
+def _index_post(connection, post):
+    connection.execute(
+        text(
+            "INSERT INTO jam_posts_fts (rowid, looking_for_instrument, genre, location, description) "
+            "VALUES (:id, :looking_for_instrument, :genre, :location, :description)"
+        ),
+        {'id': post.id, **{column: getattr(post, column) for column in SEARCH_COLUMNS}}
+    )
+
+
+@event.listens_for(JamPost, 'after_insert')
+def _search_index_on_create(mapper, connection, post):
+    if connection.dialect.name == 'sqlite' and post.is_active:
+        _index_post(connection, post)
+
+
+@event.listens_for(JamPost, 'after_update')
+def _search_index_on_update(mapper, connection, post):
+    # Only re-index when searchable text or visibility changed
+    # (e.g. not for interest_count bumps from raise_hand)
+    state = db.inspect(post)
+    changed = any(
+        state.attrs[name].history.has_changes()
+        for name in SEARCH_COLUMNS + ('is_active',)
+    )
+    if changed and connection.dialect.name == 'sqlite':
+        _unindex_post(connection, post.id)
+        if post.is_active:
+            _index_post(connection, post)
+
+
+@event.listens_for(JamPost, 'after_delete')
+def _search_index_on_delete(mapper, connection, post):
+    if connection.dialect.name == 'sqlite':
+        _unindex_post(connection, post.id)
+
+
+def ensure_search_index():
+    """
+    Create and populate jam_posts_fts for databases created before it existed
+    (create_all only fires the DDL hook when jam_posts itself is new)
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    with db.engine.begin() as connection:
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'jam_posts_fts'"
+        )).first()
+        if exists:
+            return
+        connection.execute(text(CREATE_SEARCH_INDEX))
+        connection.execute(text(
+            "INSERT INTO jam_posts_fts (rowid, looking_for_instrument, genre, location, description) "
+            "SELECT id, looking_for_instrument, genre, location, description "
+            "FROM jam_posts WHERE is_active = 1"
+        ))
+
+
+def build_search_match(q=None, location=None, instrument=None):
+    """
+    Turn free-text input into an FTS5 MATCH expression
+    Every word becomes a quoted prefix term ("drum"* matches "Drummer"), so user
+    input can never inject FTS5 syntax. Returns None when nothing is searchable.
+    """
+    def terms(value):
+        return ' AND '.join(f'"{word}"*' for word in re.findall(r'\w+', value or ''))
+    
+    clauses = []
+    if q and terms(q):
+        clauses.append(f'({terms(q)})')
+    if location and terms(location):
+        clauses.append(f'location : ({terms(location)})')
+    if instrument and terms(instrument):
+        clauses.append(f'looking_for_instrument : ({terms(instrument)})')
+    return ' AND '.join(clauses) or None
+
+
+def search_hits(match):
+    """
+    Subquery of (post_id, rank) for an FTS5 MATCH expression
+    rank is bm25 - lower means a better match
+    """
+    return db.session.query(
+        jam_posts_fts.c.rowid.label('post_id'),
+        db.func.bm25(db.literal_column('jam_posts_fts')).label('rank')
+    ).filter(
+        db.literal_column('jam_posts_fts').op('MATCH')(match)
+    ).subquery()
@@ -5,6 +5,7 @@ Message Model
 
 from database import db
 from datetime import datetime
+from sqlalchemy import event
 
 class Message(db.Model):
     """
@@ -12,11 +13,23 @@ class Message(db.Model):
     Triggered from Jam Board interactions
     """
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Both directions of a conversation share one key -> one range scan
+        db.Index('ix_messages_conversation_key_created_at', 'conversation_key', 'created_at'),
+        # A user's conversations (inbox, long-poll catch-up): one index per side,
+        # each already grouped by conversation with the latest id last
+        db.Index('ix_messages_sender_id_conversation_key_id', 'sender_id', 'conversation_key', 'id'),
+        db.Index('ix_messages_receiver_id_conversation_key_id', 'receiver_id', 'conversation_key', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
+    # Ordered user-id pair, e.g. "3:12" for messages 3->12 and 12->3
+    # Set automatically on insert (see _set_conversation_key below)
+    conversation_key = db.Column(db.String(32), nullable=True)
+    
     content = db.Column(db.Text, nullable=False)
     
     # Types: 'text', 'invite'
@@ -30,13 +43,26 @@ class Message(db.Model):
     invite_status = db.Column(db.String(20), nullable=True)
 
     created_at = db.Column(db.DateTime, default=datetime.now, index=True)
+    
+    # Legacy per-row read flag, superseded by message_read_markers below.
+    # No longer written; only read by migrate_read_markers()
     is_read = db.Column(db.Boolean, default=False)
     
     sender = db.relationship('User', foreign_keys=[sender_id], back_populates='messages_sent')
     receiver = db.relationship('User', foreign_keys=[receiver_id], back_populates='messages_received')
     
-    def to_dict(self):
-        """Convert message to JSON-serializable dict"""
+    @staticmethod
+    def conversation_key_for(user_id, other_user_id):
+        """Canonical key for the conversation between two users"""
+        low, high = sorted((int(user_id), int(other_user_id)))
+        return f'{low}:{high}'
+    
+    def to_dict(self, read_up_to=None):
+        """
+        Convert message to JSON-serializable dict
+        read_up_to is the receiver's read marker for this conversation;
+        is_read is derived from it (unknown marker -> unread)
+        """
         return {
             'id': self.id,
             'sender_id': self.sender_id,
@@ -46,5 +72,244 @@ class Message(db.Model):
             'related_id': self.related_id,
             'invite_status': self.invite_status, # <--- Sending this to frontend now
             'created_at': self.created_at.isoformat(),
-            'is_read': self.is_read
-        }
\ No newline at end of file
+            'is_read': read_up_to is not None and self.id <= read_up_to
+        }
+    
+    @staticmethod
+    def to_dicts(messages):
+        """Serialize messages with is_read taken from the receivers' read markers (one query)"""
+        markers = read_markers({(msg.receiver_id, msg.sender_id) for msg in messages})
+        return [msg.to_dict(markers.get((msg.receiver_id, msg.sender_id))) for msg in messages]
+
+
+# Cold storage for old chat history (filled by services/chat_archive.py).
+# Each row is one zlib-compressed JSON blob of up to CHAT_ARCHIVE_CHUNK_SIZE
+# consecutive messages of a conversation, with its time range for lookup.
+message_archive_chunks = db.Table('message_archive_chunks',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('conversation_key', db.String(32), nullable=False),
+    db.Column('first_created_at', db.DateTime, nullable=False),
+    db.Column('last_created_at', db.DateTime, nullable=False),
+    db.Column('message_count', db.Integer, nullable=False),
+    db.Column('payload', db.LargeBinary, nullable=False),
+    db.Column('archived_at', db.DateTime, default=datetime.now),
+    db.Index('ix_message_archive_chunks_key_last_created_at', 'conversation_key', 'last_created_at')
+)
+
+
+# High-water read receipts: everything `peer_id` sent to `user_id` up to and
+# including last_read_message_id has been read. Marking a thread read is a
+# single-row write no matter how many messages it covers.
+message_read_markers = db.Table('message_read_markers',
+    db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
+    db.Column('peer_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
+    db.Column('last_read_message_id', db.Integer, nullable=False, default=0)
+)
+
+
+def read_markers(pairs):
+    """{(user_id, peer_id): last_read_message_id} for the given pairs"""
+    if not pairs:
+        return {}
+    rows = db.session.query(message_read_markers).filter(
+        db.tuple_(message_read_markers.c.user_id, message_read_markers.c.peer_id).in_(list(pairs))
+    )
+    return {(row.user_id, row.peer_id): row.last_read_message_id for row in rows}
+
+
+# Unread counters, kept in step with messages inside the same transaction
+# so the badge and the inbox never have to COUNT(*) over messages
+message_unread_counts = db.Table('message_unread_counts',
+    db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
+    db.Column('conversation_key', db.String(32), primary_key=True),
+    db.Column('unread_count', db.Integer, nullable=False, default=0)
+)
+
+message_unread_totals = db.Table('message_unread_totals',
+    db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
+    db.Column('unread_count', db.Integer, nullable=False, default=0)
+)
+
+
+def unread_total(user_id):
+    """Total unread messages for a user (primary-key lookup)"""
+    count = db.session.query(message_unread_totals.c.unread_count).filter(
+        message_unread_totals.c.user_id == user_id
+    ).scalar()
+    return count or 0
+
+
+def adjust_unread(connection, user_id, conversation_key, delta):
+    """Add delta to a receiver's per-conversation and total unread counters"""
+    if not delta:
+        return
+    _bump(connection, message_unread_counts, {'user_id': user_id, 'conversation_key': conversation_key}, delta)
+    _bump(connection, message_unread_totals, {'user_id': user_id}, delta)
+
+
+def mark_read_up_to(user_id, peer_id, message_id):
+    """
+    Advance user_id's read marker for messages from peer_id to message_id
+    The marker never moves backwards. Returns True if it moved.
+    """
+    connection = db.session.connection()
+    markers = message_read_markers
+    is_pair = db.and_(markers.c.user_id == user_id, markers.c.peer_id == peer_id)
+    
+    current = connection.execute(db.select(markers.c.last_read_message_id).where(is_pair)).scalar()
+    if current is not None and current >= message_id:
+        return False
+    if current is None:
+        connection.execute(markers.insert().values(
+            user_id=user_id, peer_id=peer_id, last_read_message_id=message_id
+        ))
+    else:
+        connection.execute(markers.update().where(is_pair).values(last_read_message_id=message_id))
+    
+    # Re-derive the conversation's unread counter from what's left above the marker
+    conversation_key = Message.conversation_key_for(user_id, peer_id)
+    remaining = db.session.query(db.func.count(Message.id)).filter(
+        Message.conversation_key == conversation_key,
+        Message.sender_id == peer_id,
+        Message.id > message_id
+    ).scalar()
+    counted = connection.execute(db.select(message_unread_counts.c.unread_count).where(
+        message_unread_counts.c.user_id == user_id,
+        message_unread_counts.c.conversation_key == conversation_key
+    )).scalar() or 0
+    adjust_unread(connection, user_id, conversation_key, remaining - counted)
+    return True
+
+
+def _bump(connection, table, key, delta):
+    new_count = table.c.unread_count + delta
+    updated = connection.execute(
+        table.update()
+        .where(*(table.c[name] == value for name, value in key.items()))
+        .values(unread_count=db.case((new_count < 0, 0), else_=new_count))
+    ).rowcount
+    if not updated and delta > 0:
+        connection.execute(table.insert().values(unread_count=delta, **key))
+
+
+@event.listens_for(Message, 'before_insert')
+def _set_conversation_key(mapper, connection, message):
+    # Every writer (chat, ensemble invites/notifications, gig handshake)
+    # goes through here, so the key can never be missing on new rows
+    message.conversation_key = Message.conversation_key_for(message.sender_id, message.receiver_id)
+
+
+@event.listens_for(Message, 'after_insert')
+def _count_new_message(mapper, connection, message):
+    # A new message is always above the receiver's read marker
+    adjust_unread(connection, message.receiver_id, message.conversation_key, 1)
+
+
+@event.listens_for(Message, 'after_delete')
+def _count_deleted_message(mapper, connection, message):
+    read_up_to = connection.execute(
+        db.select(message_read_markers.c.last_read_message_id).where(
+            message_read_markers.c.user_id == message.receiver_id,
+            message_read_markers.c.peer_id == message.sender_id
+        )
+    ).scalar() or 0
+    if message.id > read_up_to:
+        adjust_unread(
+            connection, message.receiver_id,
+            Message.conversation_key_for(message.sender_id, message.receiver_id), -1
+        )
+
+
+def _conversation_key_expr():
+    """SQL expression computing conversation_key from the id columns"""
+    low = db.case((Message.sender_id < Message.receiver_id, Message.sender_id), else_=Message.receiver_id)
+    high = db.case((Message.sender_id < Message.receiver_id, Message.receiver_id), else_=Message.sender_id)
+    return db.cast(low, db.String) + ':' + db.cast(high, db.String)
+
+
+def rebuild_unread_counters():
+    """
+    Recompute both unread counter tables from messages (repairs drift)
+    Returns the number of users with unread messages
+    """
+    key = _conversation_key_expr()
+    markers = message_read_markers
+    db.session.execute(message_unread_counts.delete())
+    db.session.execute(message_unread_totals.delete())
+    db.session.execute(message_unread_counts.insert().from_select(
+        ('user_id', 'conversation_key', 'unread_count'),
+        db.select(Message.receiver_id, key, db.func.count())
+        .select_from(Message.__table__.outerjoin(markers, db.and_(
+            markers.c.user_id == Message.receiver_id,
+            markers.c.peer_id == Message.sender_id
+        )))
+        .where(Message.id > db.func.coalesce(markers.c.last_read_message_id, 0))
+        .group_by(Message.receiver_id, key)
+    ))
+    db.session.execute(message_unread_totals.insert().from_select(
+        ('user_id', 'unread_count'),
+        db.select(message_unread_counts.c.user_id, db.func.sum(message_unread_counts.c.unread_count))
+        .group_by(message_unread_counts.c.user_id)
+    ))
+    db.session.commit()
+    return db.session.query(message_unread_totals).count()
+
+
+def migrate_read_markers():
+    """
+    Seed read markers from the legacy per-row is_read flags (pairs that
+    have no marker yet get the id of their latest read message), then
+    rebuild the unread counters
+    Returns the number of markers created
+    """
+    markers = message_read_markers
+    has_marker = db.select(markers.c.user_id).where(
+        markers.c.user_id == Message.receiver_id,
+        markers.c.peer_id == Message.sender_id
+    ).exists()
+    created = db.session.execute(markers.insert().from_select(
+        ('user_id', 'peer_id', 'last_read_message_id'),
+        db.select(Message.receiver_id, Message.sender_id, db.func.max(Message.id))
+        .where(Message.is_read == True, ~has_marker)
+        .group_by(Message.receiver_id, Message.sender_id)
+    )).rowcount
+    db.session.commit()
+    rebuild_unread_counters()
+    return created
+
+
+def migrate_conversation_keys(batch_size=1000):
+    """
+    Add messages.conversation_key to databases created before it existed,
+    then backfill rows that have no key yet in batches
+    Also drops the per-direction thread index it replaces
+    Returns the number of rows backfilled
+    """
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('messages')}
+    if 'conversation_key' not in columns:
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("ALTER TABLE messages ADD COLUMN conversation_key VARCHAR(32)")
+            connection.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_messages_conversation_key_created_at "
+                "ON messages (conversation_key, created_at)"
+            )
+    
+    with db.engine.begin() as connection:
+        # Thread reads go through conversation_key; nothing reads this any more
+        connection.exec_driver_sql("DROP INDEX IF EXISTS ix_messages_sender_receiver_created_at")
+    
+    key = _conversation_key_expr()
+    
+    backfilled = 0
+    while True:
+        batch = db.session.query(Message.id).filter(
+            Message.conversation_key.is_(None)
+        ).limit(batch_size).scalar_subquery()
+        updated = Message.query.filter(Message.id.in_(batch)).update(
+            {Message.conversation_key: key}, synchronize_session=False
+        )
+        db.session.commit()
+        if not updated:
+            break
+        backfilled += updated
+    return backfilled
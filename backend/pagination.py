@@ -0,0 +1,53 @@
+"""
+Pagination helpers
+Opaque keyset cursors and bounded page sizes for list endpoints
+"""
+
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def encode_cursor(*values):
+    """
+    Pack the sort key of the last row on a page into an opaque token
+    Datetimes are stored as ISO strings and restored by decode_cursor
+    """
+    payload = [
+        {'dt': value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """
+    Unpack a cursor produced by encode_cursor
+    Returns a list of `size` values or raises InvalidCursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != size:
+            raise InvalidCursor(token)
+        return [
+            datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+            for value in payload
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(token)
+
+
+def page_size(requested, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Clamp a client-requested page size to [1, maximum]"""
+    if requested is None:
+        return default
+    return max(1, min(requested, maximum))
@@ -0,0 +1,155 @@
+"""
+Chat History Archival
+Moves old chat messages out of the hot `messages` table into compressed
+per-conversation chunks (message_archive_chunks)
+
+Run periodically (e.g. nightly cron):
+    python maintenance.py archive-messages [--days N] [--batch-size N]
+
+A message is archived once it is older than the horizon AND read by its
+receiver AND not a pending invite AND not the newest message of its
+conversation. That keeps unread counters, invite handling and the inbox
+working purely off the hot table. get_messages pages into the archive
+transparently via archived_messages().
+
+Each conversation is its own transaction, so the job can be interrupted and
+re-run safely.
+"""
+
+import json
+import zlib
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from database import db
+from models.message import Message, message_archive_chunks, message_read_markers
+
+ARCHIVED_COLUMNS = (
+    'id', 'sender_id', 'receiver_id', 'conversation_key', 'content',
+    'msg_type', 'related_id', 'invite_status', 'created_at', 'is_read'
+)
+
+
+def archive_old_messages(max_age_days, chunk_size):
+    """
+    Archive eligible messages older than max_age_days
+    Returns the number of messages archived
+    """
+    cutoff = datetime.now() - timedelta(days=max_age_days)
+    eligible = _eligible_messages(cutoff)
+    archived = 0
+
+    conversation_keys = [
+        key for (key,) in
+        eligible.with_entities(Message.conversation_key).distinct().order_by(Message.conversation_key)
+    ]
+    for conversation_key in conversation_keys:
+        messages = eligible.filter(
+            Message.conversation_key == conversation_key
+        ).order_by(Message.created_at, Message.id).all()
+
+        for start in range(0, len(messages), chunk_size):
+            _write_chunk(conversation_key, messages[start:start + chunk_size])
+
+        # Core delete: these are all read, so the unread counters don't move
+        db.session.execute(Message.__table__.delete().where(
+            Message.id.in_([message.id for message in messages])
+        ))
+        db.session.commit()
+        db.session.expunge_all()
+        archived += len(messages)
+
+    return archived
+
+
+def _eligible_messages(cutoff):
+    markers = message_read_markers
+    newest_per_conversation = db.session.query(
+        db.func.max(Message.id)
+    ).group_by(Message.conversation_key)
+
+    return Message.query.join(markers, and_(
+        markers.c.user_id == Message.receiver_id,
+        markers.c.peer_id == Message.sender_id
+    )).filter(
+        Message.created_at < cutoff,
+        Message.id <= markers.c.last_read_message_id,
+        Message.conversation_key.isnot(None),
+        or_(Message.invite_status.is_(None), Message.invite_status != 'pending'),
+        Message.id.notin_(newest_per_conversation)
+    )
+
+
+def _write_chunk(conversation_key, messages):
+    rows = [
+        {name: getattr(message, name) for name in ARCHIVED_COLUMNS}
+        for message in messages
+    ]
+    for row in rows:
+        row['created_at'] = row['created_at'].isoformat()
+
+    db.session.execute(message_archive_chunks.insert().values(
+        conversation_key=conversation_key,
+        first_created_at=messages[0].created_at,
+        last_created_at=messages[-1].created_at,
+        message_count=len(messages),
+        payload=zlib.compress(json.dumps(rows).encode('utf-8'))
+    ))
+
+
+def archived_messages(conversation_key, lower=None, upper=None, limit=None, newest_first=False):
+    """
+    Archived messages of a conversation strictly between the
+    (created_at, id) bounds `lower` and `upper` (either may be None),
+    oldest first, as detached Message objects
+
+    With `limit`, only the `limit` messages nearest one end are returned:
+    the newest ones with newest_first=True (scrolling up), else the oldest.
+    Chunks are then read from that end and the walk stops as soon as no
+    further chunk can hold a nearer message, so a page costs a few chunks
+    however long the archived history is. Without a limit every chunk
+    overlapping the bounds is decompressed.
+    """
+    chunks = db.session.query(
+        message_archive_chunks.c.id,
+        message_archive_chunks.c.first_created_at,
+        message_archive_chunks.c.last_created_at
+    ).filter(message_archive_chunks.c.conversation_key == conversation_key)
+    if lower is not None:
+        chunks = chunks.filter(message_archive_chunks.c.last_created_at >= lower[0])
+    if upper is not None:
+        chunks = chunks.filter(message_archive_chunks.c.first_created_at <= upper[0])
+    if newest_first:
+        chunks = chunks.order_by(message_archive_chunks.c.last_created_at.desc())
+    else:
+        chunks = chunks.order_by(message_archive_chunks.c.first_created_at.asc())
+
+    def position(message):
+        return (message.created_at, message.id)
+
+    messages = []
+    for chunk_id, first_created_at, last_created_at in chunks.all():
+        if limit is not None and len(messages) >= limit:
+            # Chunk ranges can overlap (rows archived by later runs), so stop
+            # only once this chunk lies entirely beyond the current cut-off
+            cutoff = messages[limit - 1].created_at
+            if (last_created_at < cutoff) if newest_first else (first_created_at > cutoff):
+                break
+
+        payload = db.session.query(message_archive_chunks.c.payload).filter(
+            message_archive_chunks.c.id == chunk_id
+        ).scalar()
+        for row in json.loads(zlib.decompress(payload)):
+            row['created_at'] = datetime.fromisoformat(row['created_at'])
+            row_position = (row['created_at'], row['id'])
+            if lower is not None and row_position <= tuple(lower):
+                continue
+            if upper is not None and row_position >= tuple(upper):
+                continue
+            messages.append(Message(**row))
+
+        messages.sort(key=position, reverse=newest_first)
+        if limit is not None:
+            del messages[limit:]
+
+    messages.sort(key=position)
+    return messages
@@ -0,0 +1,142 @@
+"""
+Chat Events
+In-process pub/sub that pushes chat activity to connected clients
+
+Every Message written through the ORM (chat sends, ensemble invites and
+notifications, the gig handshake message) is picked up by a session flush
+hook and published to both participants once the transaction commits;
+rolled-back work is never published. Handlers that move a read marker
+queue an 'unread' event so the badge can be refreshed.
+
+Subscribers are per-user queues held by a Broker on the Flask app, so this
+only fans out within one server process (the threaded dev server, or a
+single gunicorn worker with threads). A multi-process deployment would put
+a shared bus (e.g. Redis pub/sub) behind the same publish/subscribe calls.
+"""
+
+import queue
+from threading import Lock
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models.message import Message
+
+SUBSCRIBER_QUEUE_SIZE = 256
+PENDING_KEY = 'ensembl_chat_events'
+
+
+class Subscription:
+    """One connected client (SSE stream or long-poll request) for one user"""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self._queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # A stalled client; it resynchronises from the REST endpoints
+            pass
+
+    def wait(self, timeout):
+        """Block up to `timeout` seconds for events, then drain what's queued"""
+        try:
+            events = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Broker:
+    """user_id -> set of live subscriptions"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id, kind, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.put({'event': kind, 'data': data})
+
+
+def get_broker():
+    """The broker for the current app (created on first use)"""
+    return current_app.extensions.setdefault('ensembl_chat_broker', Broker())
+
+
+def queue_unread_changed(session, user_id):
+    """
+    Publish an 'unread' event for user_id when the session commits
+    For changes the flush hook can't see (read markers are core writes)
+    """
+    session.info.setdefault(PENDING_KEY, []).append((user_id, 'unread', {}))
+
+
+def _queue_for_participants(pending, message, kind, data):
+    for user_id in {message.sender_id, message.receiver_id}:
+        pending.append((user_id, kind, data))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_message_events(session, flush_context):
+    created = [obj for obj in session.new if isinstance(obj, Message)]
+    updated = [
+        obj for obj in session.dirty
+        if isinstance(obj, Message) and inspect(obj).attrs.invite_status.history.has_changes()
+    ]
+    if not created and not updated:
+        return
+
+    pending = session.info.setdefault(PENDING_KEY, [])
+    # Serialize now (attributes are expired after commit), with is_read
+    # taken from the receivers' read markers
+    with session.no_autoflush:
+        for kind, messages in (('message', created), ('message_updated', updated)):
+            for message, data in zip(messages, Message.to_dicts(messages)):
+                _queue_for_participants(pending, message, kind, data)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending or not has_app_context():
+        return
+    broker = get_broker()
+    for user_id, kind, data in pending:
+        broker.publish(user_id, kind, data)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,139 @@
+"""
+Chat Write Path
+Group commit for POST /api/chat/send
+
+On SQLite every commit is an fsync under a single database-wide write lock,
+so under burst load sends queue up behind each other's commits. With
+CHAT_GROUP_COMMIT_WINDOW_MS > 0, the first send to arrive becomes the
+leader of a batch: it waits up to the window (or until the batch holds
+CHAT_GROUP_COMMIT_MAX_BATCH sends), then inserts every message in the
+batch in one transaction. The other senders (followers) block until that
+commit is durable, so each request still returns only once its message is
+saved. If the batch commit fails, the leader retries each message in its
+own transaction, so one bad message fails only its own send. With the
+window at 0, each send commits on its own as before.
+
+Sender/receiver existence is checked against a short-lived cache of known
+user ids, so a burst from the same users costs no lookups.
+"""
+
+from threading import Event, Lock
+from flask import current_app
+from cache import app_cache
+from database import db
+from models.message import Message
+from models.user import User
+
+
+class ChatWriteError(RuntimeError):
+    """A message could not be committed"""
+
+
+def users_exist(*user_ids):
+    """True if every id is a user (positive answers are cached)"""
+    known = app_cache('chat_known_users', 'CHAT_USER_CACHE_TTL')
+    missing = {user_id for user_id in user_ids if not known.get(user_id)}
+    if missing:
+        found = {user_id for (user_id,) in db.session.query(User.id).filter(User.id.in_(missing))}
+        for user_id in found:
+            known.set(user_id, True)
+        missing -= found
+    return not missing
+
+
+def send_message(sender_id, receiver_id, content):
+    """Save one message and return its dict once durably committed"""
+    values = {'sender_id': sender_id, 'receiver_id': receiver_id, 'content': content}
+    window_ms = current_app.config['CHAT_GROUP_COMMIT_WINDOW_MS']
+    if window_ms <= 0:
+        try:
+            return _commit([values])[0]
+        except Exception as e:
+            raise ChatWriteError('Message could not be saved') from e
+    return _get_writer(window_ms).send(values)
+
+
+def _get_writer(window_ms):
+    writer = current_app.extensions.get('ensembl_chat_writer')
+    if writer is None:
+        writer = current_app.extensions.setdefault('ensembl_chat_writer', GroupCommitWriter(
+            window_ms / 1000, current_app.config['CHAT_GROUP_COMMIT_MAX_BATCH']
+        ))
+    return writer
+
+
+def _commit(batch_values):
+    """Insert the messages in one transaction; returns their dicts"""
+    messages = [Message(**values) for values in batch_values]
+    try:
+        db.session.add_all(messages)
+        db.session.flush()
+        # Serialize before commit expires the attributes
+        results = Message.to_dicts(messages)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return results
+
+
+def _commit_each(batch_values):
+    """Fallback after a failed batch: one transaction per message"""
+    outcomes = []
+    for values in batch_values:
+        try:
+            outcomes.append((_commit([values])[0], None))
+        except Exception as e:
+            outcomes.append((None, e))
+    return outcomes
+
+
+class _Batch:
+    def __init__(self):
+        self.values = []
+        self.full = Event()
+        self.done = Event()
+        self.outcomes = None  # (result, error) per send
+
+
+class GroupCommitWriter:
+    """Leader/follower group commit (one per app)"""
+
+    def __init__(self, window, max_batch):
+        self.window = window
+        self.max_batch = max_batch
+        self._open = None
+        self._lock = Lock()
+
+    def send(self, values):
+        with self._lock:
+            batch = self._open
+            is_leader = batch is None
+            if is_leader:
+                batch = self._open = _Batch()
+            index = len(batch.values)
+            batch.values.append(values)
+            if len(batch.values) >= self.max_batch:
+                # Seal it now; the next send starts a new batch
+                self._open = None
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            try:
+                # The leader commits on its own request's session
+                batch.outcomes = [(result, None) for result in _commit(batch.values)]
+            except Exception:
+                batch.outcomes = _commit_each(batch.values)
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        result, error = batch.outcomes[index]
+        if error is not None:
+            raise ChatWriteError('Message could not be saved') from error
+        return result
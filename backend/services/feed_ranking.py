@@ -0,0 +1,126 @@
+"""
+Feed Ranking Service
+Precomputed "For You" scores for the Jam Board
+
+Each (musician, post) candidate gets one stored score:
+
+    score = hours since epoch at post creation + match boost (in hours)
+
+so a match is worth a fixed head start in recency (a post that wants your
+instrument ranks like one posted 72 hours later). Because recency is baked
+in at creation time the score never needs recomputing as posts age, and a
+ranked page is a single read of the (user_id, score) index.
+
+Scores are written when a post is created (fan-out to musicians) and when a
+musician's matching profile changes (signup, vibe_tags update). Posts with
+no match for a musician are not stored as candidates for them; the ranked
+feed lists those after the matched ones, newest first.
+"""
+
+from database import db
+from models.jam_post import JamPost, jam_feed_scores
+from models.user import User
+
+# Boosts, expressed in hours of recency
+INSTRUMENT_MATCH_HOURS = 72
+CITY_MATCH_HOURS = 48
+NEARBY_CITY_HOURS = 24  # Same area, e.g. "San Francisco" vs "San Francisco Bay Area"
+GENRE_MATCH_HOURS = 24
+
+
+def _words(value):
+    return {part.strip().lower() for part in (value or '').split(',') if part.strip()}
+
+
+def match_boost(post, musician):
+    """
+    Hours of boost for showing `post` to `musician`
+    Works on anything with the JamPost/User attribute names (rows or models)
+    """
+    boost = 0
+
+    # Instrument: looking_for_instrument may list several ("Drums, Bass")
+    instrument = (musician.instrument or '').strip().lower()
+    if instrument and any(
+        instrument in wanted or wanted in instrument
+        for wanted in _words(post.looking_for_instrument)
+    ):
+        boost += INSTRUMENT_MATCH_HOURS
+
+    # City proximity: exact city, or one name containing the other
+    city = (musician.city or '').strip().lower()
+    location = (post.location or '').strip().lower()
+    if city and location:
+        if city == location:
+            boost += CITY_MATCH_HOURS
+        elif city in location or location in city:
+            boost += NEARBY_CITY_HOURS
+
+    # Genre overlap with the musician's vibe tags
+    if post.genre and _words(post.genre) & _words(musician.vibe_tags):
+        boost += GENRE_MATCH_HOURS
+
+    return boost
+
+
+def score(created_at, boost):
+    """Stored ranking score: recency (hours since epoch) plus match boost"""
+    return created_at.timestamp() / 3600 + boost
+
+
+def score_new_post(post):
+    """
+    Fan a newly created post out to the musicians it matches
+    Call after the post is flushed (needs post.id), in the same transaction
+    """
+    musicians = db.session.query(
+        User.id, User.instrument, User.city, User.vibe_tags
+    ).filter(User.role == 'musician', User.id != post.author_id)
+
+    rows = []
+    for musician in musicians:
+        boost = match_boost(post, musician)
+        if boost:
+            rows.append({
+                'user_id': musician.id,
+                'jam_post_id': post.id,
+                'score': score(post.created_at, boost)
+            })
+
+    if rows:
+        db.session.execute(jam_feed_scores.insert(), rows)
+    return len(rows)
+
+
+def rescore_user(user):
+    """
+    Rebuild one musician's candidates against all active posts
+    Used at signup and when profile fields that feed the score change
+    """
+    db.session.execute(jam_feed_scores.delete().where(jam_feed_scores.c.user_id == user.id))
+    if user.role != 'musician':
+        return 0
+
+    posts = db.session.query(
+        JamPost.id, JamPost.created_at, JamPost.looking_for_instrument,
+        JamPost.location, JamPost.genre
+    ).filter(JamPost.is_active == True, JamPost.author_id != user.id)
+
+    rows = []
+    for post in posts:
+        boost = match_boost(post, user)
+        if boost:
+            rows.append({
+                'user_id': user.id,
+                'jam_post_id': post.id,
+                'score': score(post.created_at, boost)
+            })
+
+    if rows:
+        db.session.execute(jam_feed_scores.insert(), rows)
+    return len(rows)
+
+
+def drop_post(post_id):
+    """Remove a closed post from every musician's candidates"""
+    db.session.execute(jam_feed_scores.delete().where(jam_feed_scores.c.jam_post_id == post_id))
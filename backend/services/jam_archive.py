@@ -0,0 +1,71 @@
+"""
+Jam Post Archival
+Moves closed or stale jam posts (and their hand raises) out of the hot tables
+
+Run periodically (e.g. nightly cron):
+    python maintenance.py archive-jam-posts [--days N] [--batch-size N]
+
+Each batch is its own transaction, so the job can be interrupted and
+re-run safely and never holds the SQLite write lock for long.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from database import db
+from models.jam_post import (
+    JamPost, jam_interests, jam_feed_scores, jam_posts_fts,
+    jam_posts_archive, jam_interests_archive
+)
+
+POST_COLUMNS = (
+    'id', 'author_id', 'looking_for_instrument', 'genre', 'location',
+    'description', 'created_at', 'is_active', 'interest_count'
+)
+
+
+def archive_stale_jam_posts(max_age_days, batch_size):
+    """
+    Archive posts that are closed or older than max_age_days
+    Returns the number of posts archived
+    """
+    cutoff = datetime.now() - timedelta(days=max_age_days)
+    stale = or_(JamPost.is_active == False, JamPost.created_at < cutoff)
+    archived = 0
+
+    while True:
+        post_ids = [
+            post_id for (post_id,) in
+            db.session.query(JamPost.id).filter(stale).order_by(JamPost.id).limit(batch_size)
+        ]
+        if not post_ids:
+            break
+
+        _archive_batch(post_ids)
+        db.session.commit()
+        archived += len(post_ids)
+
+    return archived
+
+
+def _archive_batch(post_ids):
+    """Copy one batch into the archive tables, then delete it from the hot ones"""
+    post_table = JamPost.__table__
+    now = datetime.now()
+
+    db.session.execute(jam_posts_archive.insert().from_select(
+        POST_COLUMNS + ('archived_at',),
+        db.select(*[post_table.c[name] for name in POST_COLUMNS], db.literal(now))
+        .where(post_table.c.id.in_(post_ids))
+    ))
+    db.session.execute(jam_interests_archive.insert().from_select(
+        ('jam_post_id', 'user_id', 'timestamp'),
+        db.select(jam_interests.c.jam_post_id, jam_interests.c.user_id, jam_interests.c.timestamp)
+        .where(jam_interests.c.jam_post_id.in_(post_ids))
+    ))
+
+    db.session.execute(jam_interests.delete().where(jam_interests.c.jam_post_id.in_(post_ids)))
+    db.session.execute(jam_feed_scores.delete().where(jam_feed_scores.c.jam_post_id.in_(post_ids)))
+    if db.engine.dialect.name == 'sqlite':
+        # Bulk deletes skip the mapper events that normally maintain jam_posts_fts
+        db.session.execute(jam_posts_fts.delete().where(jam_posts_fts.c.rowid.in_(post_ids)))
+    db.session.execute(post_table.delete().where(post_table.c.id.in_(post_ids)))
@@ -0,0 +1,36 @@
+"""
+Ensemble Membership Service
+A user's ensemble ids (led or joined), cached per app
+
+Gig board, my-gigs, history, analytics and admin all need "which ensembles
+is this musician in?" on every request. The answer only changes when an
+ensemble is created or someone joins or leaves, so those writers call
+invalidate() after committing and everyone else reads the cached set.
+"""
+
+from cache import app_cache
+from database import db
+from models.ensemble import Ensemble, ensemble_members
+
+
+def _cache():
+    return app_cache('ensemble_membership', 'ENSEMBLE_MEMBERSHIP_CACHE_TTL', max_entries=4096)
+
+
+def ensemble_ids_for(user_id):
+    """frozenset of ids of the ensembles user_id leads or is a member of"""
+    user_id = int(user_id)
+    cache = _cache()
+    ensemble_ids = cache.get(user_id)
+    if ensemble_ids is None:
+        led = db.select(Ensemble.id).where(Ensemble.leader_id == user_id)
+        joined = db.select(ensemble_members.c.ensemble_id).where(ensemble_members.c.user_id == user_id)
+        ensemble_ids = cache.set(user_id, frozenset(db.session.scalars(led.union(joined))))
+    return ensemble_ids
+
+
+def invalidate(*user_ids):
+    """Drop cached memberships (call after committing a membership change)"""
+    cache = _cache()
+    for user_id in user_ids:
+        cache.pop(int(user_id))
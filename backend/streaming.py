@@ -0,0 +1,44 @@
+"""
+Streaming JSON responses
+Emit large list payloads incrementally instead of building them in memory
+"""
+
+import json
+from itertools import islice
+from flask import Response, request, stream_with_context
+
+STREAM_BATCH_SIZE = 200
+
+
+def wants_stream():
+    """True when the client asked for a streamed response (?stream=true)"""
+    return request.args.get('stream', 'false').lower() == 'true'
+
+
+def stream_json_list(key, query, serialize_batch, batch_size=STREAM_BATCH_SIZE, extra=None):
+    """
+    Stream {"<key>": [...], **extra} from a query
+
+    Rows are fetched with yield_per(batch_size) and handed to
+    serialize_batch(rows) -> list of dicts one batch at a time, so memory per
+    request is bounded by the batch size and the first bytes go out as soon
+    as the first batch is ready. The body decodes to the same JSON as
+    jsonify's output, though keys keep their insertion order (not sorted).
+    """
+    def generate():
+        yield '{' + json.dumps(key) + ':['
+        rows = iter(query.yield_per(batch_size))
+        first = True
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            for item in serialize_batch(batch):
+                yield ('' if first else ',') + json.dumps(item)
+                first = False
+        yield ']'
+        for name, value in (extra or {}).items():
+            yield ',' + json.dumps(name) + ':' + json.dumps(value)
+        yield '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -4,6 +4,8 @@ Test configuration and fixtures
 import pytest
 import sys
 import os
+from contextlib import contextmanager
+from sqlalchemy import event
 
 # Add backend directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -38,6 +40,57 @@ def client(app):
     return app.test_client()
 
 
+@pytest.fixture
+def count_queries(app):
+    """
+    Record the SQL statements run on the engine:
+        with count_queries() as statements: ...
+    """
+    @contextmanager
+    def recording():
+        statements = []
+        
+        def listener(connection, cursor, statement, *args):
+            statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+    
+    return recording
+
+
+@pytest.fixture
+def query_plans(app):
+    """
+    SQLite query plans of the SELECTs run on the engine:
+        with query_plans() as plans: ...
+    Each plan is its detail lines joined by newlines (filled in on exit)
+    """
+    @contextmanager
+    def recording():
+        executed = []
+        plans = []
+        
+        def listener(connection, cursor, statement, parameters, *args):
+            if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                executed.append((statement, parameters))
+        
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            yield plans
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        with db.engine.connect() as connection:
+            for statement, parameters in executed:
+                rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+                plans.append('\n'.join(row.detail for row in rows))
+    
+    return recording
+
+
 @pytest.fixture
 def musician_user(app):
     """Create a test musician user"""
@@ -139,14 +139,12 @@ class TestChat:
         response = client.put(f'/api/chat/mark-read/conversation/{musician_user}/{user2_id}')
         assert response.status_code == 200
         
-        # Verify messages are marked read
-        with app.app_context():
-            messages = Message.query.filter_by(
-                sender_id=user2_id,
-                receiver_id=musician_user
-            ).all()
-            for msg in messages:
-                assert msg.is_read == True
+        # Verify messages are marked read (derived from the read marker)
+        response = client.get(f'/api/chat/messages/{musician_user}/{user2_id}')
+        messages = response.get_json()['messages']
+        assert messages
+        for msg in messages:
+            assert msg['is_read'] == True
     
     def test_respond_to_invite_accept(self, client, app, musician_user, ensemble):
         """Test accepting an ensemble invite"""
@@ -157,3 +155,420 @@ class TestChat:
         """Test declining an ensemble invite"""
         # SKIP: Invite response functionality not yet implemented in chat blueprint
         pass
+    
+    def test_inbox(self, client, app, musician_user, venue_user):
+        """Test the inbox lists peers with last message and unread count"""
+        with app.app_context():
+            friend = User(email='inbox@test.com', name='Friend', city='LA',
+                          role='musician', instrument='Sax')
+            db.session.add(friend)
+            db.session.commit()
+            friend_id = friend.id
+            
+            db.session.add_all([
+                Message(sender_id=friend_id, receiver_id=musician_user, content='One'),
+                Message(sender_id=friend_id, receiver_id=musician_user, content='Two'),
+                Message(sender_id=musician_user, receiver_id=venue_user, content='Hi venue'),
+                Message(sender_id=musician_user, receiver_id=friend_id, content='Reply'),
+            ])
+            db.session.commit()
+        
+        data = client.get(f'/api/chat/inbox/{musician_user}').get_json()
+        conversations = data['conversations']
+        assert [c['user']['id'] for c in conversations] == [friend_id, venue_user]
+        assert conversations[0]['last_message']['content'] == 'Reply'
+        assert conversations[0]['unread_count'] == 2
+        assert conversations[1]['unread_count'] == 0
+        assert data['next_cursor'] is None
+        
+        page = client.get(f'/api/chat/inbox/{musician_user}?limit=1').get_json()
+        assert [c['user']['id'] for c in page['conversations']] == [friend_id]
+        page = client.get(f'/api/chat/inbox/{musician_user}?limit=1&cursor={page["next_cursor"]}').get_json()
+        assert [c['user']['id'] for c in page['conversations']] == [venue_user]
+    
+    def test_paginated_history(self, client, app, musician_user):
+        """Test scrolling back through a thread and polling for new messages"""
+        with app.app_context():
+            peer = User(email='history@test.com', name='Chatty', city='LA',
+                        role='musician', instrument='Flute')
+            db.session.add(peer)
+            db.session.commit()
+            peer_id = peer.id
+            for i in range(5):
+                db.session.add(Message(sender_id=peer_id, receiver_id=musician_user, content=f'm{i}'))
+                db.session.commit()
+        
+        url = f'/api/chat/messages/{musician_user}/{peer_id}'
+        page = client.get(f'{url}?limit=2').get_json()
+        assert [m['content'] for m in page['messages']] == ['m3', 'm4']
+        
+        older = client.get(f'{url}?limit=2&before={page["before_cursor"]}').get_json()
+        assert [m['content'] for m in older['messages']] == ['m1', 'm2']
+        oldest = client.get(f'{url}?limit=2&before={older["before_cursor"]}').get_json()
+        assert [m['content'] for m in oldest['messages']] == ['m0']
+        assert oldest['before_cursor'] is None
+        
+        with app.app_context():
+            db.session.add(Message(sender_id=musician_user, receiver_id=peer_id, content='m5'))
+            db.session.commit()
+        newer = client.get(f'{url}?after={page["after_cursor"]}').get_json()
+        assert [m['content'] for m in newer['messages']] == ['m5']
+    
+    def test_conversation_key(self, client, app, musician_user, venue_user):
+        """Test every message gets the canonical key and old rows are backfilled"""
+        from models.message import migrate_conversation_keys
+        
+        client.post('/api/chat/send', json={
+            'sender_id': venue_user, 'receiver_id': musician_user, 'content': 'Hello'
+        })
+        expected = Message.conversation_key_for(musician_user, venue_user)
+        
+        with app.app_context():
+            assert expected == Message.conversation_key_for(venue_user, musician_user)
+            assert Message.query.one().conversation_key == expected
+            
+            # Simulate rows written before the column existed
+            Message.query.update({'conversation_key': None})
+            db.session.commit()
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql(
+                    "CREATE INDEX ix_messages_sender_receiver_created_at "
+                    "ON messages (sender_id, receiver_id, created_at)"
+                )
+            assert migrate_conversation_keys(batch_size=1) == 1
+            assert Message.query.one().conversation_key == expected
+            assert 'ix_messages_sender_receiver_created_at' not in {
+                index['name'] for index in db.inspect(db.engine).get_indexes('messages')
+            }
+    
+    def test_live_events(self, client, app, musician_user, venue_user):
+        """Test committed messages are pushed to subscribers and the long-poll fallback"""
+        from services.chat_events import get_broker
+        
+        with app.app_context():
+            subscription = get_broker().subscribe(musician_user)
+        
+        client.post('/api/chat/send', json={
+            'sender_id': venue_user, 'receiver_id': musician_user, 'content': 'Soundcheck at 6?'
+        })
+        events = subscription.wait(0)
+        assert [item['event'] for item in events] == ['message']
+        assert events[0]['data']['content'] == 'Soundcheck at 6?'
+        message_id = events[0]['data']['id']
+        
+        # Rolled-back writes are never published
+        with app.app_context():
+            db.session.add(Message(sender_id=venue_user, receiver_id=musician_user, content='Oops'))
+            db.session.flush()
+            db.session.rollback()
+        assert subscription.wait(0) == []
+        
+        client.put(f'/api/chat/mark-read/conversation/{musician_user}/{venue_user}')
+        assert [item['event'] for item in subscription.wait(0)] == ['unread']
+        subscription.close()
+        
+        # Long-poll: catch up from a message id, then time out with nothing new
+        data = client.get(f'/api/chat/poll/{musician_user}?since=0&timeout=0').get_json()
+        assert [item['data']['id'] for item in data['events']] == [message_id]
+        assert data['since'] == message_id
+        assert data['unread_count'] == 0
+        
+        data = client.get(f'/api/chat/poll/{musician_user}?since={message_id}&timeout=0').get_json()
+        assert data['events'] == []
+        assert data['since'] == message_id
+        
+        # SSE stream opens with the current unread badge
+        response = client.get(f'/api/chat/stream/{musician_user}', buffered=False)
+        assert response.mimetype == 'text/event-stream'
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b'retry:')
+        assert next(chunks) == b'event: unread\ndata: {"unread_count": 0}\n\n'
+        response.close()
+    
+    def test_live_events_carry_read_state(self, client, app, musician_user, venue_user):
+        """Test pushed updates of already-read messages are not reported as unread"""
+        from services.chat_events import get_broker
+        
+        with app.app_context():
+            invite = Message(sender_id=venue_user, receiver_id=musician_user, content='Join us?',
+                             msg_type='invite', invite_status='pending')
+            db.session.add(invite)
+            db.session.commit()
+            invite_id = invite.id
+        client.put(f'/api/chat/mark-read/conversation/{musician_user}/{venue_user}')
+        
+        with app.app_context():
+            subscription = get_broker().subscribe(musician_user)
+            Message.query.get(invite_id).invite_status = 'accepted'
+            db.session.commit()
+        events = subscription.wait(0)
+        subscription.close()
+        assert [item['event'] for item in events] == ['message_updated']
+        assert events[0]['data']['is_read'] is True
+        
+        response = client.post('/api/chat/send', json={
+            'sender_id': venue_user, 'receiver_id': musician_user, 'content': 'Great!'
+        })
+        assert response.get_json()['data']['is_read'] is False
+    
+    def test_unread_counters(self, client, app, musician_user, venue_user):
+        """Test the unread counters track sends and reads, and can be rebuilt"""
+        from models.message import (
+            unread_total, message_unread_counts, rebuild_unread_counters
+        )
+        
+        for content in ('One', 'Two', 'Three'):
+            client.post('/api/chat/send', json={
+                'sender_id': venue_user, 'receiver_id': musician_user, 'content': content
+            })
+        client.post('/api/chat/send', json={
+            'sender_id': musician_user, 'receiver_id': venue_user, 'content': 'Reply'
+        })
+        
+        def badge(user_id):
+            return client.get(f'/api/chat/unread-count/{user_id}').get_json()['unread_count']
+        
+        assert badge(musician_user) == 3
+        assert badge(venue_user) == 1
+        
+        with app.app_context():
+            first_id = Message.query.filter_by(content='One').one().id
+        client.put(f'/api/chat/mark-read/{first_id}')
+        client.put(f'/api/chat/mark-read/{first_id}')  # Idempotent
+        assert badge(musician_user) == 2
+        
+        client.put(f'/api/chat/mark-read/conversation/{musician_user}/{venue_user}')
+        assert badge(musician_user) == 0
+        assert badge(venue_user) == 1
+        
+        # Drift (e.g. rows changed behind the ORM's back) is repaired by a rebuild
+        with app.app_context():
+            db.session.execute(message_unread_counts.delete())
+            db.session.commit()
+            assert rebuild_unread_counters() == 1
+            assert unread_total(venue_user) == 1
+            assert unread_total(musician_user) == 0
+        
+        inbox = client.get(f'/api/chat/inbox/{venue_user}').get_json()['conversations']
+        assert inbox[0]['unread_count'] == 1
+    
+    def test_read_markers(self, client, app, musician_user, venue_user):
+        """Test read receipts are a high-water mark per (reader, peer)"""
+        from models.message import message_read_markers, migrate_read_markers
+        
+        ids = [
+            client.post('/api/chat/send', json={
+                'sender_id': venue_user, 'receiver_id': musician_user, 'content': f'Message {n}'
+            }).get_json()['data']['id']
+            for n in range(3)
+        ]
+        
+        # Reading the second message covers everything before it
+        client.put(f'/api/chat/mark-read/{ids[1]}')
+        client.put(f'/api/chat/mark-read/{ids[0]}')  # Never moves the marker back
+        messages = client.get(f'/api/chat/messages/{musician_user}/{venue_user}').get_json()['messages']
+        assert [msg['is_read'] for msg in messages] == [True, True, False]
+        assert client.get(f'/api/chat/unread-count/{musician_user}').get_json()['unread_count'] == 1
+        
+        # Legacy is_read flags are converted into a marker
+        with app.app_context():
+            db.session.execute(message_read_markers.delete())
+            Message.query.filter(Message.id.in_(ids[:2])).update(
+                {'is_read': True}, synchronize_session=False
+            )
+            db.session.commit()
+            assert migrate_read_markers() == 1
+            marker = db.session.query(message_read_markers).one()
+            assert (marker.user_id, marker.peer_id, marker.last_read_message_id) == (musician_user, venue_user, ids[1])
+        assert client.get(f'/api/chat/unread-count/{musician_user}').get_json()['unread_count'] == 1
+    
+    def test_archived_history(self, client, app, musician_user, venue_user):
+        """Test old read messages move to cold storage and history pages through them"""
+        from datetime import datetime, timedelta
+        from models.message import message_archive_chunks
+        from services.chat_archive import archive_old_messages
+        
+        with app.app_context():
+            start = datetime.now() - timedelta(days=800)
+            for n in range(10):
+                sender, receiver = (venue_user, musician_user) if n % 3 else (musician_user, venue_user)
+                db.session.add(Message(
+                    sender_id=sender, receiver_id=receiver, content=f'Old {n}',
+                    created_at=start + timedelta(minutes=n),
+                    msg_type='invite' if n == 4 else 'text',
+                    invite_status='pending' if n == 4 else None
+                ))
+            for n in range(3):
+                db.session.add(Message(
+                    sender_id=venue_user, receiver_id=musician_user, content=f'New {n}'
+                ))
+            db.session.commit()
+            all_ids = [m.id for m in Message.query.order_by(Message.created_at, Message.id)]
+        
+        client.put(f'/api/chat/mark-read/conversation/{musician_user}/{venue_user}')
+        client.put(f'/api/chat/mark-read/conversation/{venue_user}/{musician_user}')
+        
+        with app.app_context():
+            # Everything old except the pending invite
+            assert archive_old_messages(max_age_days=365, chunk_size=4) == 9
+            assert db.session.query(message_archive_chunks).count() == 3
+            assert Message.query.count() == 4
+        
+        # Scrolling up walks from the hot range into the archive, in order
+        url = f'/api/chat/messages/{musician_user}/{venue_user}?limit=5'
+        data = client.get(url).get_json()
+        seen = [msg['id'] for msg in data['messages']]
+        while data['before_cursor']:
+            data = client.get(f"{url}&before={data['before_cursor']}").get_json()
+            seen = [msg['id'] for msg in data['messages']] + seen
+        assert seen == all_ids
+        assert data['messages'][0]['content'] == 'Old 0'
+        assert data['messages'][0]['is_read'] is True
+        
+        # Walking forward from an archived position also merges both stores
+        data = client.get(f"{url}&after={data['after_cursor']}").get_json()
+        assert [msg['id'] for msg in data['messages']] == all_ids[3:8]
+    
+    def test_archived_pages_read_few_chunks(self, client, app, musician_user, venue_user, monkeypatch):
+        """Test a page deep in archived history decompresses only the chunks it needs"""
+        import zlib
+        from datetime import datetime, timedelta
+        from services.chat_archive import archive_old_messages
+        
+        with app.app_context():
+            start = datetime.now() - timedelta(days=800)
+            for n in range(41):
+                db.session.add(Message(
+                    sender_id=venue_user, receiver_id=musician_user, content=f'Old {n}',
+                    created_at=start + timedelta(minutes=n)
+                ))
+            db.session.commit()
+            all_ids = [m.id for m in Message.query.order_by(Message.created_at, Message.id)]
+        client.put(f'/api/chat/mark-read/conversation/{musician_user}/{venue_user}')
+        with app.app_context():
+            # The newest message stays hot; 40 go into 10 chunks
+            assert archive_old_messages(max_age_days=365, chunk_size=4) == 40
+        
+        decompressed = []
+        real_decompress = zlib.decompress
+        monkeypatch.setattr(zlib, 'decompress', lambda data: decompressed.append(1) or real_decompress(data))
+        
+        url = f'/api/chat/messages/{musician_user}/{venue_user}?limit=4'
+        data = client.get(url).get_json()
+        seen = [msg['id'] for msg in data['messages']]
+        pages = 1
+        while data['before_cursor']:
+            data = client.get(f"{url}&before={data['before_cursor']}").get_json()
+            seen = [msg['id'] for msg in data['messages']] + seen
+            pages += 1
+        assert seen == all_ids
+        assert len(decompressed) <= 2 * pages
+        
+        decompressed.clear()
+        data = client.get(f"{url}&after={data['after_cursor']}").get_json()
+        assert [msg['id'] for msg in data['messages']] == all_ids[1:5]
+        assert len(decompressed) <= 2
+    
+    def test_group_commit_sends(self, client, app, musician_user, venue_user):
+        """Test concurrent sends share one transaction when group commit is on"""
+        from threading import Thread
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session
+        
+        app.config['CHAT_GROUP_COMMIT_WINDOW_MS'] = 200
+        commits = []
+        
+        def count_commit(session):
+            commits.append(session)
+        
+        responses = []
+        
+        def send(n):
+            with app.test_client() as thread_client:
+                responses.append(thread_client.post('/api/chat/send', json={
+                    'sender_id': venue_user, 'receiver_id': musician_user, 'content': f'Burst {n}'
+                }))
+        
+        event.listen(Session, 'after_commit', count_commit)
+        try:
+            threads = [Thread(target=send, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            event.remove(Session, 'after_commit', count_commit)
+        
+        assert [response.status_code for response in responses] == [201] * 8
+        assert len({response.get_json()['data']['id'] for response in responses}) == 8
+        assert len(commits) < 8
+        
+        with app.app_context():
+            assert Message.query.count() == 8
+        assert client.get(f'/api/chat/unread-count/{musician_user}').get_json()['unread_count'] == 8
+        
+        # Unknown users are still rejected
+        response = client.post('/api/chat/send', json={
+            'sender_id': venue_user, 'receiver_id': 9999, 'content': 'Hello?'
+        })
+        assert response.status_code == 404
+    
+    def test_group_commit_isolates_bad_message(self, client, app, musician_user, venue_user):
+        """Test one failing message in a batch fails only its own send"""
+        from threading import Thread
+        from services import chat_writer
+        
+        assert client.post('/api/chat/send', json={
+            'sender_id': venue_user, 'receiver_id': musician_user, 'content': None
+        }).status_code == 400
+        
+        app.config['CHAT_GROUP_COMMIT_WINDOW_MS'] = 200
+        outcomes = {}
+        
+        def send(n, content):
+            with app.app_context():
+                try:
+                    outcomes[n] = chat_writer.send_message(venue_user, musician_user, content)['content']
+                except chat_writer.ChatWriteError:
+                    outcomes[n] = 'failed'
+        
+        threads = [Thread(target=send, args=(n, None if n == 2 else f'Burst {n}')) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert outcomes == {0: 'Burst 0', 1: 'Burst 1', 2: 'failed', 3: 'Burst 3'}
+        with app.app_context():
+            assert Message.query.count() == 3
+    
+    def test_inbox_reads_user_indexes(self, client, app, musician_user, venue_user, query_plans):
+        """Test the inbox and long-poll catch-up search the per-user indexes, never scan messages"""
+        from database import create_missing_indexes
+        
+        for n in range(3):
+            client.post('/api/chat/send', json={
+                'sender_id': venue_user, 'receiver_id': musician_user, 'content': f'Hi {n}'
+            })
+        
+        with app.app_context():
+            # Older databases get the indexes from `maintenance.py create-indexes`
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql("DROP INDEX ix_messages_sender_id_conversation_key_id")
+                connection.exec_driver_sql("DROP INDEX ix_messages_receiver_id_conversation_key_id")
+            assert set(create_missing_indexes()) == {
+                'ix_messages_sender_id_conversation_key_id', 'ix_messages_receiver_id_conversation_key_id'
+            }
+            
+            with query_plans() as plans:
+                inbox = client.get(f'/api/chat/inbox/{musician_user}').get_json()
+                poll = client.get(f'/api/chat/poll/{musician_user}?since=0&timeout=0').get_json()
+        
+        assert [c['user']['id'] for c in inbox['conversations']] == [venue_user]
+        assert inbox['conversations'][0]['last_message']['content'] == 'Hi 2'
+        assert len(poll['events']) == 3
+        
+        plan = '\n'.join(plans)
+        assert 'ix_messages_sender_id_conversation_key_id' in plan
+        assert 'ix_messages_receiver_id_conversation_key_id' in plan
+        assert 'SCAN messages' not in plan
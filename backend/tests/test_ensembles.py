@@ -106,3 +106,55 @@ class TestEnsembles:
         """Test deleting an ensemble"""
         # SKIP: No DELETE /api/ensembles/<id> endpoint exists
         pass
+    
+    def test_membership_cache(self, client, app, musician_user):
+        """Test cached ensemble membership follows create, accept and remove"""
+        from services import membership
+        
+        with app.app_context():
+            user2 = User(email='member@test.com', name='Member', city='SF', role='musician')
+            db.session.add(user2)
+            db.session.commit()
+            user2_id = user2.id
+            # Prime the cache with "no ensembles" for both users
+            assert membership.ensemble_ids_for(musician_user) == set()
+            assert membership.ensemble_ids_for(user2_id) == set()
+        
+        ensemble_id = client.post('/api/ensembles/', json={
+            'name': 'Cached Band', 'leader_id': musician_user
+        }).get_json()['ensemble']['id']
+        client.post(f'/api/ensembles/{ensemble_id}/invite', json={'user_id': user2_id})
+        
+        with app.app_context():
+            assert membership.ensemble_ids_for(musician_user) == {ensemble_id}
+            assert membership.ensemble_ids_for(user2_id) == set()
+        
+        client.post(f'/api/ensembles/{ensemble_id}/accept', json={'user_id': user2_id})
+        with app.app_context():
+            assert membership.ensemble_ids_for(user2_id) == {ensemble_id}
+        
+        client.delete(f'/api/ensembles/{ensemble_id}/members/{user2_id}')
+        with app.app_context():
+            assert membership.ensemble_ids_for(user2_id) == set()
+    
+    def test_membership_lookup_uses_indexes(self, client, app, musician_user, ensemble, query_plans):
+        """Test a membership cache miss searches indexes, also after upgrading an old database"""
+        from database import create_missing_indexes
+        from services import membership
+        
+        with app.app_context():
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql("DROP INDEX ix_ensembles_leader_id")
+                connection.exec_driver_sql("DROP INDEX ix_ensemble_members_user_id_ensemble_id")
+            assert set(create_missing_indexes()) == {
+                'ix_ensembles_leader_id', 'ix_ensemble_members_user_id_ensemble_id'
+            }
+            assert create_missing_indexes() == []
+            
+            with query_plans() as plans:
+                assert membership.ensemble_ids_for(musician_user) == {ensemble}
+        
+        plan = plans[0]
+        assert 'SEARCH ensembles USING COVERING INDEX ix_ensembles_leader_id' in plan
+        assert 'SEARCH ensemble_members USING COVERING INDEX ix_ensemble_members_user_id_ensemble_id' in plan
+        assert 'SCAN' not in plan.replace('SCAN CONSTANT ROW', '')
@@ -5,6 +5,7 @@ import pytest
 from database import db
 from models.gig import Gig
 from models.venue import Venue
+from models.ensemble import Ensemble
 from datetime import datetime
 
 
@@ -64,6 +65,11 @@ class TestGigs:
         data = response.get_json()
         assert isinstance(data['gigs'], list)
         assert len(data['gigs']) > 0
+        
+        # Streamed mode returns the same document
+        streamed = client.get('/api/gigs/?stream=true')
+        assert 'Content-Length' not in streamed.headers
+        assert streamed.get_json() == data
     
     def test_apply_to_gig(self, client, app, venue_user, ensemble):
         """Test ensemble applying to a gig"""
@@ -137,3 +143,384 @@ class TestGigs:
         assert response.status_code == 200
         json_data = response.get_json()
         assert json_data.get('both_confirmed') == True
+    
+    def test_gig_board_for_musician(self, client, app, musician_user, ensemble, count_queries):
+        """Test the board's per-viewer status and visibility come from one query"""
+        from models.gig import GigApplication
+        from models.user import User
+        
+        with app.app_context():
+            gig_ids = {}
+            for n in range(3):
+                owner = User(email=f'board{n}@test.com', name=f'Owner {n}', city='SF', role='venue')
+                db.session.add(owner)
+                db.session.flush()
+                venue = Venue(user_id=owner.id, name=f'Board Venue {n}', location=f'{n} Main St, SF')
+                db.session.add(venue)
+                db.session.flush()
+                for title, is_open in (('Open', True), ('Closed', False), ('Rejected', True), ('Pending', True)):
+                    gig = Gig(
+                        venue_id=venue.id, title=f'{title} {n}', date_time=datetime(2030, 1, 1 + n),
+                        description='Description', is_open=is_open
+                    )
+                    db.session.add(gig)
+                    db.session.flush()
+                    gig_ids[gig.title] = gig.id
+            
+            db.session.add_all([
+                # Accepted but not yet seen: shown although the gig is closed
+                GigApplication(gig_id=gig_ids['Closed 0'], ensemble_id=ensemble, status='accepted'),
+                # Rejected and dismissed: hidden from the board
+                GigApplication(gig_id=gig_ids['Rejected 0'], ensemble_id=ensemble, status='rejected',
+                               musician_acknowledged=True),
+                GigApplication(gig_id=gig_ids['Pending 0'], ensemble_id=ensemble, status='pending'),
+            ])
+            db.session.commit()
+            
+            with count_queries() as statements:
+                response = client.get('/api/gigs/', headers={'X-User-Id': str(musician_user)})
+        
+        gigs = {gig['title']: gig for gig in response.get_json()['gigs']}
+        assert 'Closed 0' in gigs and gigs['Closed 0']['my_status'] == 'accepted'
+        assert 'Rejected 0' not in gigs
+        assert gigs['Pending 0']['my_status'] == 'pending'
+        assert gigs['Open 1']['my_status'] is None
+        assert 'Closed 1' not in gigs
+        assert gigs['Open 2']['venue']['name'] == 'Board Venue 2'
+        # viewer + membership + the board itself (venues joined, no lazy loads)
+        assert len(statements) <= 3
+    
+    def test_gig_board_window_and_pages(self, client, app, venue_user):
+        """Test from/to date filtering and keyset pagination of the board"""
+        with app.app_context():
+            venue = Venue(user_id=venue_user, name='Window Venue', location='1 Window St, SF')
+            db.session.add(venue)
+            db.session.flush()
+            for day in (1, 2, 2, 3, 5, 8):
+                db.session.add(Gig(
+                    venue_id=venue.id, title=f'Day {day}', date_time=datetime(2030, 3, day, 20),
+                    description='Description'
+                ))
+            db.session.commit()
+        
+        # A plain `to` date covers that whole day (Day 5 is at 20:00)
+        response = client.get('/api/gigs/?from=2030-03-02&to=2030-03-05')
+        assert [gig['title'] for gig in response.get_json()['gigs']] == ['Day 2', 'Day 2', 'Day 3', 'Day 5']
+        response = client.get('/api/gigs/?from=2030-03-02&to=2030-03-05T20:00')
+        assert [gig['title'] for gig in response.get_json()['gigs']][-1] == 'Day 5'
+        response = client.get('/api/gigs/?from=2030-03-02&to=2030-03-05T19:59')
+        assert [gig['title'] for gig in response.get_json()['gigs']][-1] == 'Day 3'
+        
+        titles, cursor = [], None
+        while True:
+            url = '/api/gigs/?limit=4' + (f'&cursor={cursor}' if cursor else '')
+            data = client.get(url).get_json()
+            titles += [gig['title'] for gig in data['gigs']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        assert titles == ['Day 1', 'Day 2', 'Day 2', 'Day 3', 'Day 5', 'Day 8']
+        
+        assert client.get('/api/gigs/?from=next-week').status_code == 400
+        assert client.get('/api/gigs/?cursor=garbage').status_code == 400
+    
+    def test_gig_board_window_uses_index(self, client, app, venue_user, query_plans):
+        """Test the date window is a range scan, also after upgrading an old database"""
+        from database import create_missing_indexes
+        
+        with app.app_context():
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql("DROP INDEX ix_gigs_is_open_date_time")
+            assert 'ix_gigs_is_open_date_time' in create_missing_indexes()
+            
+            with query_plans() as plans:
+                client.get('/api/gigs/?from=2030-03-02&to=2030-03-05&limit=5')
+        
+        assert any('SEARCH gigs USING INDEX ix_gigs_is_open_date_time' in plan for plan in plans)
+        assert not any('SCAN gigs' in plan for plan in plans)
+    
+    def test_application_listing_views(self, client, app, venue_user, count_queries):
+        """Test application listings load in fixed queries, in full and summary form"""
+        from models.gig import GigApplication
+        from models.ensemble import Ensemble
+        from models.user import User
+        
+        with app.app_context():
+            venue = Venue(user_id=venue_user, name='Busy Venue', location='1 Busy St, SF')
+            db.session.add(venue)
+            db.session.flush()
+            gig = Gig(venue_id=venue.id, title='Popular Gig', date_time=datetime(2030, 6, 1),
+                      description='Description')
+            db.session.add(gig)
+            db.session.flush()
+            for n in range(4):
+                leader, member, invitee = [
+                    User(email=f'{role}{n}@test.com', name=f'{role} {n}', city='SF', role='musician')
+                    for role in ('leader', 'member', 'invitee')
+                ]
+                db.session.add_all([leader, member, invitee])
+                db.session.flush()
+                band = Ensemble(name=f'Band {n}', leader_id=leader.id)
+                band.members.extend([leader, member])
+                band.invited_users.append(invitee)
+                db.session.add(band)
+                db.session.flush()
+                db.session.add(GigApplication(gig_id=gig.id, ensemble_id=band.id))
+            db.session.commit()
+            gig_id = gig.id
+            
+            with count_queries() as statements:
+                full = client.get(f'/api/gigs/{gig_id}/applications').get_json()['applications']
+                full_queries = len(statements)
+                summary = client.get(f'/api/gigs/{gig_id}/applications?view=summary').get_json()['applications']
+                summary_queries = len(statements) - full_queries
+        
+        assert len(full) == 4
+        assert [len(a['ensemble']['members']) for a in full] == [2, 2, 2, 2]
+        assert [len(a['ensemble']['invited_users']) for a in full] == [1, 1, 1, 1]
+        # gig + applications + ensembles + members + invites
+        assert full_queries <= 5
+        
+        assert [a['ensemble']['name'] for a in summary] == ['Band 0', 'Band 1', 'Band 2', 'Band 3']
+        assert all(a['ensemble']['member_count'] == 2 for a in summary)
+        assert all(a['ensemble']['invited_count'] == 1 for a in summary)
+        assert 'members' not in summary[0]['ensemble']
+        # gig + applications + ensembles + member counts + invite counts
+        assert summary_queries <= 5
+        
+        assert client.get(f'/api/gigs/{gig_id}/applications?view=everything').status_code == 400
+    
+    def test_venue_gig_history(self, client, app, venue_user, musician_user, count_queries):
+        """Test venue history joins the accepted ensemble in one query and pages"""
+        from models.gig import GigApplication
+        from models.ensemble import Ensemble
+        from models.user import User
+        
+        with app.app_context():
+            venue = Venue(user_id=venue_user, name='History Venue', location='1 Past St, SF')
+            sideman = User(email='sideman@test.com', name='Sideman', city='SF', role='musician')
+            db.session.add_all([venue, sideman])
+            db.session.flush()
+            band = Ensemble(name='History Band', leader_id=musician_user)
+            band.members.extend([User.query.get(musician_user), sideman])
+            db.session.add(band)
+            db.session.flush()
+            for day in range(1, 6):
+                gig = Gig(venue_id=venue.id, title=f'Night {day}', date_time=datetime(2024, 5, day),
+                          description='Description', status='completed', is_open=False)
+                db.session.add(gig)
+                db.session.flush()
+                if day != 3:
+                    db.session.add(GigApplication(gig_id=gig.id, ensemble_id=band.id, status='accepted'))
+                db.session.add(GigApplication(gig_id=gig.id, ensemble_id=band.id, status='rejected'))
+            db.session.commit()
+            venue_id = venue.id
+            
+            with count_queries() as statements:
+                data = client.get(f'/api/gigs/history/venue/{venue_id}').get_json()
+        
+        assert [gig['title'] for gig in data['gigs']] == ['Night 5', 'Night 4', 'Night 3', 'Night 2', 'Night 1']
+        assert data['gigs'][0]['accepted_ensemble'] == {
+            'id': data['gigs'][0]['accepted_ensemble']['id'],
+            'name': 'History Band',
+            'leader_name': 'Test Musician',
+            'members_count': 2
+        }
+        assert 'accepted_ensemble' not in data['gigs'][2]
+        assert data['stats']['total'] == 5
+        # venue + history, regardless of the number of gigs
+        assert len(statements) <= 2
+        
+        page = client.get(f'/api/gigs/history/venue/{venue_id}?limit=2').get_json()
+        assert [gig['title'] for gig in page['gigs']] == ['Night 5', 'Night 4']
+        assert page['stats']['total'] == 5
+        page = client.get(f"/api/gigs/history/venue/{venue_id}?limit=2&cursor={page['next_cursor']}").get_json()
+        assert [gig['title'] for gig in page['gigs']] == ['Night 3', 'Night 2']
+    
+    def test_venue_gig_history_uses_index(self, client, app, venue_user, ensemble, query_plans):
+        """Test the accepted-application lookup searches an index, also after upgrading"""
+        from database import create_missing_indexes
+        from models.gig import GigApplication
+        
+        with app.app_context():
+            venue = Venue(user_id=venue_user, name='Indexed Venue', location='6 Seek St, SF')
+            db.session.add(venue)
+            db.session.flush()
+            gig = Gig(venue_id=venue.id, title='Indexed Night', date_time=datetime(2024, 5, 1),
+                      description='Description', status='completed', is_open=False)
+            db.session.add(gig)
+            db.session.flush()
+            db.session.add(GigApplication(gig_id=gig.id, ensemble_id=ensemble, status='accepted'))
+            db.session.commit()
+            venue_id = venue.id
+            
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql("DROP INDEX ix_gig_applications_gig_id_status")
+            assert 'ix_gig_applications_gig_id_status' in create_missing_indexes()
+            
+            with query_plans() as plans:
+                data = client.get(f'/api/gigs/history/venue/{venue_id}').get_json()
+        
+        assert data['gigs'][0]['accepted_ensemble']['name'] == 'Test Band'
+        assert any('ix_gig_applications_gig_id_status' in plan for plan in plans)
+        assert not any('SCAN gig_applications' in plan for plan in plans)
+    
+    def test_ensemble_gig_history(self, client, app, venue_user, ensemble, count_queries):
+        """Test ensemble history is filtered and counted in SQL, with pages"""
+        from models.gig import GigApplication
+        
+        with app.app_context():
+            venue = Venue(user_id=venue_user, name='Band History Venue', location='2 Past St, SF')
+            db.session.add(venue)
+            db.session.flush()
+            cases = [
+                ('Rejected', 'open', 'rejected', None),
+                ('Completed', 'completed', 'accepted', None),
+                ('Confirmed', 'accepted', 'accepted', datetime(2024, 1, 4)),
+                ('Upcoming', 'accepted', 'accepted', None),  # not history yet
+                ('Pending', 'open', 'pending', None),         # not history
+            ]
+            for day, (title, gig_status, app_status, confirmed_at) in enumerate(cases, start=1):
+                gig = Gig(venue_id=venue.id, title=title, date_time=datetime(2024, 1, day),
+                          description='Description', status=gig_status)
+                db.session.add(gig)
+                db.session.flush()
+                db.session.add(GigApplication(gig_id=gig.id, ensemble_id=ensemble,
+                                              status=app_status, confirmed_at=confirmed_at))
+            db.session.commit()
+            
+            with count_queries() as statements:
+                data = client.get(f'/api/gigs/history/ensemble/{ensemble}').get_json()
+        
+        assert [a['gig_details']['title'] for a in data['applications']] == ['Confirmed', 'Completed', 'Rejected']
+        assert data['applications'][0]['gig_details']['venue_name'] == 'Band History Venue'
+        assert data['stats'] == {'total': 3, 'verified': 2, 'rejected': 1}
+        # ensemble + stats + history + members + invites, regardless of history size
+        assert len(statements) <= 5
+        
+        page = client.get(f'/api/gigs/history/ensemble/{ensemble}?limit=2').get_json()
+        assert [a['gig_details']['title'] for a in page['applications']] == ['Confirmed', 'Completed']
+        assert page['stats']['total'] == 3
+        page = client.get(f"/api/gigs/history/ensemble/{ensemble}?limit=2&cursor={page['next_cursor']}").get_json()
+        assert [a['gig_details']['title'] for a in page['applications']] == ['Rejected']
+        assert page['next_cursor'] is None
+    
+    def test_verified_flag(self, client, app, venue_user, ensemble):
+        """Test is_verified is stored when both confirmations land, and backfilled"""
+        from models.gig import GigApplication, backfill_is_verified
+        
+        with app.app_context():
+            venue = Venue(user_id=venue_user, name='Verify Venue', location='3 Proof St, SF')
+            db.session.add(venue)
+            db.session.flush()
+            gig = Gig(venue_id=venue.id, title='Verify Gig', date_time=datetime(2024, 2, 1),
+                      description='Description', status='accepted', is_open=False)
+            db.session.add(gig)
+            db.session.flush()
+            application = GigApplication(gig_id=gig.id, ensemble_id=ensemble, status='accepted')
+            db.session.add(application)
+            db.session.commit()
+            application_id, venue_id = application.id, venue.id
+        
+        url = f'/api/gigs/applications/{application_id}/confirm'
+        client.put(url, json={'confirmer_role': 'venue', 'gig_happened': True})
+        with app.app_context():
+            assert GigApplication.query.get(application_id).is_verified is False
+        
+        client.put(url, json={'confirmer_role': 'ensemble', 'gig_happened': True})
+        client.put(url, json={'confirmer_role': 'ensemble', 'gig_happened': True})  # Repeat is a no-op
+        with app.app_context():
+            assert GigApplication.query.get(application_id).is_verified is True
+            assert Venue.query.get(venue_id).verified_gig_count == 1
+            
+            GigApplication.query.update({'is_verified': False})
+            db.session.commit()
+            assert backfill_is_verified() == 1
+            assert GigApplication.query.get(application_id).is_verified is True
+        
+        # Changing an answer back and forth keeps the counters in step
+        client.put(url, json={'confirmer_role': 'venue', 'gig_happened': False})
+        with app.app_context():
+            assert GigApplication.query.get(application_id).is_verified is False
+            assert Venue.query.get(venue_id).verified_gig_count == 0
+        client.put(url, json={'confirmer_role': 'venue', 'gig_happened': True})
+        with app.app_context():
+            assert Venue.query.get(venue_id).verified_gig_count == 1
+            assert Ensemble.query.get(ensemble).verified_gig_count == 1
+    
+    def test_verified_history(self, client, app, venue_user, musician_user, ensemble):
+        """Test both history endpoints list and count verified gigs from the stored flag"""
+        from models.gig import GigApplication
+        
+        with app.app_context():
+            venue = Venue(user_id=venue_user, name='History Venue', location='5 Past Rd, SF')
+            db.session.add(venue)
+            db.session.flush()
+            for n, verified in enumerate([True, False, True]):
+                gig = Gig(venue_id=venue.id, title=f'History {n}', date_time=datetime(2024, 3, n + 1),
+                          description='Description', status='completed', is_open=False)
+                db.session.add(gig)
+                db.session.flush()
+                db.session.add(GigApplication(gig_id=gig.id, ensemble_id=ensemble,
+                                              status='accepted', is_verified=verified))
+            db.session.add(Gig(venue_id=venue.id, title='Open', date_time=datetime(2024, 4, 1),
+                               description='Description'))
+            db.session.commit()
+        
+        for user_id, path, listed in ((musician_user, 'musician', 3), (venue_user, 'venue', 4)):
+            headers = {'X-User-Id': str(user_id)}
+            data = client.get(f'/api/history/{path}', headers=headers).get_json()
+            assert data['verified_count'] == 2
+            assert len(data['history']) == listed
+            assert [h['verified'] for h in data['history']][-3:] == [True, False, True]
+            
+            data = client.get(f'/api/history/{path}?verified=true', headers=headers).get_json()
+            assert [h['gig_title'] for h in data['history']] == ['History 2', 'History 0']
+            assert data['verified_count'] == 2
+    
+    def test_gig_event_log(self, client, app, venue_user, ensemble):
+        """Test each transition appends an event, readable since a sequence number"""
+        from models.gig import GigEvent
+        
+        with app.app_context():
+            venue = Venue(user_id=venue_user, name='Event Venue', location='4 Log Ln, SF')
+            db.session.add(venue)
+            db.session.flush()
+            gig = Gig(venue_id=venue.id, title='Event Gig', date_time=datetime(2025, 3, 1),
+                      description='Description')
+            db.session.add(gig)
+            db.session.commit()
+            gig_id, venue_id = gig.id, venue.id
+        
+        start = client.get('/api/gigs/events').get_json()['next_since']
+        
+        application_id = client.post(f'/api/gigs/{gig_id}/apply', json={'ensemble_id': ensemble}).get_json()['application']['id']
+        client.put(f'/api/gigs/applications/{application_id}/accept')
+        url = f'/api/gigs/applications/{application_id}/confirm'
+        client.put(url, json={'confirmer_role': 'venue', 'gig_happened': True})
+        client.put(url, json={'confirmer_role': 'ensemble', 'gig_happened': True})
+        
+        response = client.get(f'/api/gigs/events?since={start}')
+        assert response.status_code == 200
+        data = response.get_json()
+        events = data['events']
+        assert [e['event_type'] for e in events] == ['applied', 'accepted', 'confirmed', 'confirmed', 'verified']
+        assert [e['seq'] for e in events] == sorted(e['seq'] for e in events)
+        assert all(e['gig_id'] == gig_id and e['venue_id'] == venue_id for e in events)
+        assert events[2]['details'] == {'confirmer_role': 'venue', 'gig_happened': True}
+        assert data['next_since'] == events[-1]['seq']
+        
+        # Nothing new since the last sequence number
+        caught_up = client.get(f"/api/gigs/events?since={data['next_since']}").get_json()
+        assert caught_up == {'events': [], 'next_since': data['next_since']}
+        
+        # Pages and filters
+        page = client.get(f'/api/gigs/events?since={start}&limit=2').get_json()
+        assert [e['event_type'] for e in page['events']] == ['applied', 'accepted']
+        filtered = client.get(f'/api/gigs/events?ensemble_id={ensemble}&since={page["next_since"]}').get_json()
+        assert [e['event_type'] for e in filtered['events']] == ['confirmed', 'confirmed', 'verified']
+        assert client.get('/api/gigs/events?gig_id=0').get_json()['events'] == []
+        
+        with app.app_context():
+            with pytest.raises(ValueError):
+                GigEvent.record('cancelled', Gig.query.get(gig_id))
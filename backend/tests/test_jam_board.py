@@ -108,3 +108,392 @@ class TestJamBoard:
         """Test deleting a jam post"""
         response = client.delete(f'/api/jam-board/{jam_post}')
         assert response.status_code == 200
+    
+    def test_feed_batched_serialization(self, client, app, musician_user, count_queries):
+        """Test the feed reports counts/hand raises with a fixed number of queries"""
+        with app.app_context():
+            author = User.query.get(musician_user)
+            fan = User(
+                email='fan@test.com',
+                name='Fan',
+                city='SF',
+                role='musician',
+                instrument='Bass'
+            )
+            db.session.add(fan)
+            db.session.flush()
+            fan_id = fan.id
+            raised_ids = []
+            for i in range(5):
+                post = JamPost(
+                    author_id=author.id,
+                    looking_for_instrument='Drums',
+                    location='San Francisco',
+                    description=f'Post {i}'
+                )
+                db.session.add(post)
+                db.session.flush()
+                if i % 2 == 0:
+                    raised_ids.append(post.id)
+            db.session.commit()
+        
+        for post_id in raised_ids:
+            client.post(f'/api/jam-board/{post_id}/raise-hand', json={'user_id': fan_id})
+        
+        with app.app_context():
+            with count_queries() as statements:
+                response = client.get(f'/api/jam-board/?user_id={fan_id}')
+        
+        assert response.status_code == 200
+        posts = response.get_json()['posts']
+        assert len(posts) == 5
+        raised = [p for p in posts if p['has_raised_hand']]
+        assert len(raised) == 3
+        assert all(p['interest_count'] == 1 for p in raised)
+        # posts + authors + viewer's hand raises (counts are stored on the post)
+        assert len(statements) <= 3
+    
+    def test_feed_keyset_pagination(self, client, app, musician_user):
+        """Test walking the feed page by page with next_cursor"""
+        with app.app_context():
+            for i in range(5):
+                db.session.add(JamPost(
+                    author_id=musician_user,
+                    looking_for_instrument='Keys',
+                    location='Oakland',
+                    description=f'Page post {i}'
+                ))
+            db.session.commit()
+        
+        seen = []
+        cursor = None
+        while True:
+            url = '/api/jam-board/?limit=2' + (f'&cursor={cursor}' if cursor else '')
+            data = client.get(url).get_json()
+            assert len(data['posts']) <= 2
+            seen.extend(p['id'] for p in data['posts'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        
+        assert len(seen) == 5
+        assert len(set(seen)) == 5
+        
+        response = client.get('/api/jam-board/?cursor=not-a-cursor')
+        assert response.status_code == 400
+    
+    def test_search_jam_posts(self, client, app, musician_user):
+        """Test full-text search and indexed filters on the feed"""
+        with app.app_context():
+            db.session.add_all([
+                JamPost(author_id=musician_user, looking_for_instrument='Drummer',
+                        genre='Jazz', location='San Francisco',
+                        description='Bebop trio needs drums'),
+                JamPost(author_id=musician_user, looking_for_instrument='Bass',
+                        genre='Rock', location='Oakland',
+                        description='Garage rock, loud'),
+            ])
+            closed = JamPost(author_id=musician_user, looking_for_instrument='Drummer',
+                             genre='Jazz', location='San Francisco',
+                             description='Old jazz post')
+            db.session.add(closed)
+            db.session.commit()
+            closed_id = closed.id
+        
+        client.delete(f'/api/jam-board/{closed_id}')
+        
+        data = client.get('/api/jam-board/?q=jazz drum').get_json()
+        assert [p['description'] for p in data['posts']] == ['Bebop trio needs drums']
+        
+        data = client.get('/api/jam-board/?location=fran').get_json()
+        assert [p['location'] for p in data['posts']] == ['San Francisco']
+        
+        data = client.get('/api/jam-board/?instrument=bass').get_json()
+        assert [p['looking_for_instrument'] for p in data['posts']] == ['Bass']
+        
+        # FTS5 syntax in user input is treated as plain words
+        response = client.get('/api/jam-board/?q=" OR *')
+        assert response.status_code == 200
+        
+        # Search results page with the cursor instead of repeating page one
+        with app.app_context():
+            db.session.add_all([
+                JamPost(author_id=musician_user, looking_for_instrument='Keys',
+                        location='Berkeley', description=f'Jazz session {n}')
+                for n in range(5)
+            ])
+            db.session.commit()
+        seen, cursor = [], None
+        while True:
+            url = '/api/jam-board/?q=jazz&limit=2' + (f'&cursor={cursor}' if cursor else '')
+            data = client.get(url).get_json()
+            seen += [p['id'] for p in data['posts']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        assert len(seen) == len(set(seen)) == 6
+    
+    def test_interest_counter(self, client, app, jam_post, musician_user):
+        """Test raise_hand maintains interest_count and the rebuild repairs drift"""
+        from models.jam_post import rebuild_interest_counts
+        
+        response = client.post(f'/api/jam-board/{jam_post}/raise-hand', json={'user_id': musician_user})
+        assert response.get_json()['count'] == 1
+        
+        with app.app_context():
+            assert JamPost.query.get(jam_post).interest_count == 1
+            
+            # Simulate drift, then repair it
+            JamPost.query.filter_by(id=jam_post).update({'interest_count': 7})
+            db.session.commit()
+            assert rebuild_interest_counts() == 1
+            assert JamPost.query.get(jam_post).interest_count == 1
+        
+        data = client.get('/api/jam-board/?sort=popular').get_json()
+        assert data['posts'][0]['interest_count'] == 1
+        
+        response = client.post(f'/api/jam-board/{jam_post}/raise-hand', json={'user_id': musician_user})
+        assert response.get_json()['count'] == 0
+    
+    def test_interest_count_upgrade(self, client, app, jam_post, musician_user):
+        """Test the rebuild adds interest_count to a database created without it"""
+        from models.jam_post import rebuild_interest_counts
+        
+        client.post(f'/api/jam-board/{jam_post}/raise-hand', json={'user_id': musician_user})
+        
+        with app.app_context():
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql("DROP INDEX ix_jam_posts_interest_count")
+                connection.exec_driver_sql("ALTER TABLE jam_posts DROP COLUMN interest_count")
+            
+            assert rebuild_interest_counts() == 1
+            assert 'ix_jam_posts_interest_count' in {
+                index['name'] for index in db.inspect(db.engine).get_indexes('jam_posts')
+            }
+        
+        data = client.get('/api/jam-board/?sort=popular').get_json()
+        assert data['posts'][0]['interest_count'] == 1
+    
+    def test_raise_hand_constant_queries(self, client, app, jam_post, count_queries):
+        """Test the toggle cost does not grow with the number of raised hands"""
+        from models.jam_post import jam_interests
+        
+        with app.app_context():
+            users = [
+                User(email=f'crowd{i}@test.com', name=f'Crowd {i}', city='SF',
+                     role='musician', instrument='Voice')
+                for i in range(30)
+            ]
+            db.session.add_all(users)
+            db.session.flush()
+            db.session.execute(jam_interests.insert(), [
+                {'jam_post_id': jam_post, 'user_id': u.id} for u in users[1:]
+            ])
+            JamPost.query.filter_by(id=jam_post).update({'interest_count': len(users) - 1})
+            db.session.commit()
+            newcomer_id = users[0].id
+            
+            with count_queries() as statements:
+                response = client.post(f'/api/jam-board/{jam_post}/raise-hand', json={'user_id': newcomer_id})
+        
+        data = response.get_json()
+        assert data['has_raised_hand'] == True
+        assert data['count'] == 30
+        # post, user, existence check, insert, counter update, counter read-back
+        assert len(statements) <= 6
+        assert not any('FROM users, jam_interests' in s for s in statements)
+    
+    def test_feed_etag_and_invalidation(self, client, app, jam_post, musician_user):
+        """Test 304 on unchanged feeds and fresh payloads after writes"""
+        response = client.get(f'/api/jam-board/?user_id={musician_user}')
+        etag = response.headers['ETag']
+        assert response.get_json()['posts'][0]['has_raised_hand'] == False
+        
+        response = client.get(f'/api/jam-board/?user_id={musician_user}',
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        
+        # raise_hand invalidates the cached counts and changes the viewer overlay
+        client.post(f'/api/jam-board/{jam_post}/raise-hand', json={'user_id': musician_user})
+        response = client.get(f'/api/jam-board/?user_id={musician_user}',
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        post = response.get_json()['posts'][0]
+        assert post['has_raised_hand'] == True
+        assert post['interest_count'] == 1
+        
+        # Anonymous viewers share the cached payload but not the overlay
+        post = client.get('/api/jam-board/').get_json()['posts'][0]
+        assert post['has_raised_hand'] == False
+        assert post['interest_count'] == 1
+    
+    def test_ranked_feed(self, client, app, musician_user, query_plans):
+        """Test the precomputed personalized ranking"""
+        response = client.post('/api/auth/signup', json={
+            'email': 'drummer@test.com',
+            'name': 'Drummer',
+            'instrument': 'Drums',
+            'city': 'Oakland',
+            'vibe_tags': 'Jazz,Funk'
+        })
+        drummer_id = response.get_json()['user']['id']
+        
+        def post(instrument, location, genre):
+            return client.post('/api/jam-board/', json={
+                'author_id': musician_user,
+                'looking_for_instrument': instrument,
+                'location': location,
+                'genre': genre,
+                'description': f'{instrument} in {location}'
+            }).get_json()['post']['id']
+        
+        best = post('Drums', 'Oakland', 'Jazz')
+        city_only = post('Bass', 'Oakland', 'Rock')
+        unrelated = post('Violin', 'Boston', 'Classical')
+        instrument_only = post('Drums, Keys', 'Boston', 'Metal')
+        genre_only = post('Violin', 'Boston', 'Jazz')
+        
+        # Unmatched posts follow the matched ones
+        data = client.get(f'/api/jam-board/?sort=ranked&user_id={drummer_id}').get_json()
+        ranked = [p['id'] for p in data['posts']]
+        assert ranked == [best, instrument_only, city_only, genre_only, unrelated]
+        
+        # Closing a post drops it from the ranking; pages cross into the unmatched tail
+        client.delete(f'/api/jam-board/{best}')
+        url = f'/api/jam-board/?sort=ranked&user_id={drummer_id}&limit=1'
+        seen, cursor = [], None
+        with app.app_context(), query_plans() as plans:
+            while True:
+                data = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+                seen += [p['id'] for p in data['posts']]
+                cursor = data['next_cursor']
+                if not cursor:
+                    break
+        assert seen == [instrument_only, city_only, genre_only, unrelated]
+        
+        # Both tiers walk an index instead of scanning and sorting the feed
+        lines = [line for plan in plans for line in plan.split('\n')]
+        assert any('SEARCH jam_feed_scores USING INDEX ix_jam_feed_scores_user_score' in line for line in lines)
+        assert any('USING INDEX ix_jam_posts_active_created_at' in line for line in lines)
+        assert 'SCAN jam_posts' not in lines
+        assert not any('TEMP B-TREE FOR ORDER BY' in line for line in lines)
+        
+        # A profile change re-ranks immediately, despite the cached page
+        client.get(f'/api/jam-board/?sort=ranked&user_id={drummer_id}')
+        client.put(f'/api/users/{drummer_id}', json={'vibe_tags': 'Classical'})
+        data = client.get(f'/api/jam-board/?sort=ranked&user_id={drummer_id}').get_json()
+        assert [p['id'] for p in data['posts']] == [instrument_only, city_only, unrelated, genre_only]
+    
+    def test_archive_stale_jam_posts(self, client, app, musician_user, jam_post):
+        """Test closed and old posts move to the archive with their hand raises"""
+        from datetime import datetime, timedelta
+        from models.jam_post import jam_interests, jam_posts_archive, jam_interests_archive
+        from services.jam_archive import archive_stale_jam_posts
+        
+        client.post(f'/api/jam-board/{jam_post}/raise-hand', json={'user_id': musician_user})
+        client.delete(f'/api/jam-board/{jam_post}')
+        
+        with app.app_context():
+            old = JamPost(author_id=musician_user, looking_for_instrument='Tuba',
+                          location='Reno', description='Ancient post',
+                          created_at=datetime.now() - timedelta(days=200))
+            fresh = JamPost(author_id=musician_user, looking_for_instrument='Tuba',
+                            location='Reno', description='Fresh post')
+            db.session.add_all([old, fresh])
+            db.session.commit()
+            fresh_id = fresh.id
+            
+            assert archive_stale_jam_posts(max_age_days=90, batch_size=1) == 2
+            
+            assert [p.id for p in JamPost.query.all()] == [fresh_id]
+            assert db.session.query(jam_posts_archive).count() == 2
+            assert db.session.query(jam_interests).count() == 0
+            assert db.session.query(jam_interests_archive).count() == 1
+        
+        data = client.get('/api/jam-board/?q=tuba').get_json()
+        assert [p['id'] for p in data['posts']] == [fresh_id]
+    
+    def test_archive_never_reuses_post_ids(self, client, app, musician_user, jam_post):
+        """Test a post created after an archive run gets a fresh id and archives too"""
+        from models.jam_post import jam_posts_archive
+        from services.jam_archive import archive_stale_jam_posts
+        
+        client.delete(f'/api/jam-board/{jam_post}')
+        with app.app_context():
+            assert archive_stale_jam_posts(max_age_days=90, batch_size=10) == 1
+        
+        response = client.post('/api/jam-board/', json={
+            'author_id': musician_user, 'looking_for_instrument': 'Bass',
+            'location': 'Oakland', 'description': 'Second post'
+        })
+        new_id = response.get_json()['post']['id']
+        assert new_id != jam_post
+        
+        client.delete(f'/api/jam-board/{new_id}')
+        with app.app_context():
+            assert archive_stale_jam_posts(max_age_days=90, batch_size=10) == 1
+            archived = sorted(post_id for (post_id,) in db.session.query(jam_posts_archive.c.id))
+            assert archived == sorted([jam_post, new_id])
+    
+    def test_rebuild_jam_posts_table(self, client, app, musician_user, jam_post):
+        """Test an upgraded table without AUTOINCREMENT is rebuilt and skips archived ids"""
+        from models.jam_post import rebuild_with_autoincrement
+        from services.jam_archive import archive_stale_jam_posts
+        
+        keep = client.post('/api/jam-board/', json={
+            'author_id': musician_user, 'looking_for_instrument': 'Cello',
+            'location': 'Oakland', 'description': 'Still open'
+        }).get_json()['post']['id']
+        client.post(f'/api/jam-board/{keep}/raise-hand', json={'user_id': musician_user})
+        client.delete(f'/api/jam-board/{jam_post}')
+        
+        with app.app_context():
+            # Recreate jam_posts the way older databases have it: plain rowid ids, no partial index
+            with db.engine.begin() as connection:
+                ddl = connection.exec_driver_sql(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'jam_posts'"
+                ).scalar()
+                connection.exec_driver_sql(
+                    ddl.replace('jam_posts', 'jam_posts_plain', 1).replace(' AUTOINCREMENT', '')
+                )
+                connection.exec_driver_sql("INSERT INTO jam_posts_plain SELECT * FROM jam_posts")
+                connection.exec_driver_sql("DROP TABLE jam_posts")
+                connection.exec_driver_sql("ALTER TABLE jam_posts_plain RENAME TO jam_posts")
+                connection.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'jam_posts'")
+            
+            # The newest post is archived, so a plain rowid table would hand its id out again
+            db.session.query(JamPost).filter_by(id=keep).update({'is_active': False})
+            db.session.commit()
+            assert archive_stale_jam_posts(max_age_days=90, batch_size=10) == 2
+            
+            assert rebuild_with_autoincrement() is True
+            assert rebuild_with_autoincrement() is False
+            indexes = {index['name'] for index in db.inspect(db.engine).get_indexes('jam_posts')}
+            assert 'ix_jam_posts_active_created_at' in indexes
+        
+        new_id = client.post('/api/jam-board/', json={
+            'author_id': musician_user, 'looking_for_instrument': 'Bass',
+            'location': 'Oakland', 'description': 'After the upgrade'
+        }).get_json()['post']['id']
+        assert new_id > max(jam_post, keep)
+        
+        data = client.get('/api/jam-board/?q=upgrade').get_json()
+        assert [post['id'] for post in data['posts']] == [new_id]
+    
+    def test_streamed_feed_matches_regular_feed(self, client, app, jam_post, musician_user):
+        """Test ?stream=true returns the same JSON as the buffered feed"""
+        client.post(f'/api/jam-board/{jam_post}/raise-hand', json={'user_id': musician_user})
+        
+        regular = client.get(f'/api/jam-board/?user_id={musician_user}')
+        streamed = client.get(f'/api/jam-board/?user_id={musician_user}&stream=true')
+        assert streamed.status_code == 200
+        # Streamed bodies have no length up front and skip the cached/ETag path
+        assert 'Content-Length' not in streamed.headers
+        assert 'ETag' not in streamed.headers
+        assert 'ETag' in regular.headers
+        assert streamed.get_json() == regular.get_json()
+        
+        popular = client.get('/api/jam-board/?sort=popular&q=drummer&stream=true')
+        buffered = client.get('/api/jam-board/?sort=popular&q=drummer').get_json()
+        assert popular.get_json()['posts'] == buffered['posts'] != []